@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from recipies.asgi import RecipeReadApp  # noqa: E402
+
+#cached recipe reads are answered on the event loop, the rest by django
+application = RecipeReadApp(django_application)
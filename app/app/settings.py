@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.db.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,16 +80,83 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+#connections are checked out of a per process pool for each request and
+#returned at its end, see core.db.pool. DB_POOL_MAX_SIZE=0 turns pooling
+#off, DB_CONN_MAX_AGE then keeps a connection per thread instead
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            #seconds to wait for a connection when all are in use
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+            #idle seconds after which a connection is probed before use
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+        },
+    }
+}
+
+
+#read replicas, comma separated hosts with the default database's name
+#and credentials, mirrored by the default test database. Connecting
+#gives up after DB_REPLICA_CONNECT_TIMEOUT seconds, a replica that is
+#down is probed during a request
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASE_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'},
+        OPTIONS={'connect_timeout': int(
+            os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2)
+        )},
+    )
+
+#safe requests read from a replica unless the client wrote in the last
+#REPLICA_STICKY_SECONDS, replicas lagging more than REPLICA_MAX_LAG
+#seconds are skipped, see core.db.replicas
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# local memory by default, point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (eg. django_redis.cache.RedisCache) in production
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+#seconds API responses are cached for per user, conditional GETs are
+#answered from the same data version. 0 turns it off, the default with the
+#local memory cache: a write is only seen by the worker process that made
+#it, the others would serve and confirm what they cached before it
+API_CACHE_TIMEOUT = int(os.environ.get(
+    'API_CACHE_TIMEOUT',
+    0 if CACHES['default']['BACKEND'].endswith('.LocMemCache') else 300
+))
+
+#threads resizing uploaded recipe images, see recipies.images
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+#disk used by resized recipe images, see recipies.renditions
+RENDITION_CACHE_MAX_BYTES = int(
+    os.environ.get('RENDITION_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+)
 
 
 # Password validation
@@ -108,6 +177,45 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+#PASSWORD_HASHER picks the hasher new passwords use, the others still
+#verify and their hashes are upgraded on the next login, see user.hashers
+_HASHERS = {
+    'scrypt': 'user.hashers.ScryptPasswordHasher',
+    'argon2': 'user.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'user.hashers.PBKDF2PasswordHasher',
+}
+_PREFERRED_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [_HASHERS[_PREFERRED_HASHER]] + [
+    hasher for name, hasher in _HASHERS.items() if name != _PREFERRED_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+#KiB
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)
+)
+#passwords hashed at once per process, defaults to one per core
+HASHER_WORKERS = int(os.environ.get('HASHER_WORKERS', os.cpu_count() or 1))
+
+#seconds a stored api token is accepted for, 0 for ever, an expired one is
+#replaced on the next login
+TOKEN_EXPIRY = int(os.environ.get('TOKEN_EXPIRY', 0))
+#also hand out signed access tokens, verified without the database, and
+#refresh tokens to renew them, see user.tokens
+SIGNED_TOKENS = os.environ.get('SIGNED_TOKENS', '') in ('1', 'true', 'yes')
+SIGNED_TOKEN_ACCESS_LIFETIME = int(
+    os.environ.get('SIGNED_TOKEN_ACCESS_LIFETIME', 300)
+)
+SIGNED_TOKEN_REFRESH_LIFETIME = int(
+    os.environ.get('SIGNED_TOKEN_REFRESH_LIFETIME', 14 * 24 * 3600)
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -128,8 +236,17 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
+#x-accel-redirect or x-sendfile to let the front end server send media
+#files, see core.media
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.User'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipies.pagination.RecipeCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
+}
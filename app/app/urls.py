@@ -13,14 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path , include
+from django.urls import path , re_path, include
 
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core import health, media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('healthz', health.healthz, name='healthz'),
+    path('readyz', health.readyz, name='readyz'),
     path('api/user/',include('user.urls')),
     path('api/recipies/', include('recipies.urls')),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    #ranges, etags and sendfile offload, see core.media
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            media.serve),
+]
\ No newline at end of file
@@ -0,0 +1,228 @@
+import collections
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection was returned to a full pool in time"""
+
+
+class ConnectionPool:
+    """A bounded pool of psycopg2 connections for one process
+
+    At most max_size connections are open, checkouts wait up to timeout
+    seconds for one to be returned. Connections are reused most recently
+    returned first, those idle for check_after seconds are probed with a
+    query before being handed out, and those older than max_lifetime or
+    idle for max_idle seconds are closed.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=10, max_lifetime=1800,
+                 max_idle=600, check_after=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+
+        #(connection, created, returned) most recently returned last
+        self._idle = collections.deque()
+        self._created = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self._counters = collections.Counter()
+        self._max_wait = 0.0
+
+    def stats(self):
+        """Sizes, counters and wait times of the pool"""
+        with self._condition:
+            checkouts = self._counters['checkouts']
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self._counters['created'],
+                'destroyed': self._counters['destroyed'],
+                'checkouts': checkouts,
+                'waits': self._counters['waits'],
+                'timeouts': self._counters['timeouts'],
+                'failed_checks': self._counters['failed_checks'],
+                'wait_ms_avg': self._counters['wait_ns'] / 1e6 / checkouts
+                if checkouts else 0.0,
+                'wait_ms_max': self._max_wait * 1000,
+            }
+
+    def acquire(self):
+        """Check out a healthy connection, opening one if there's room"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'no connection available in {self.timeout}s, '
+                            f'all {self.max_size} are in use'
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    connection, created, returned = self._idle.pop()
+                else:
+                    connection = None
+                    self._size += 1
+
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except BaseException:
+                    self._forget(None)
+                    raise
+                with self._condition:
+                    self._created[id(connection)] = time.monotonic()
+                    self._counters['created'] += 1
+            elif not self._healthy(connection, created, returned):
+                self._forget(connection)
+                continue
+
+            self._checked_out(time.monotonic() - start, waited)
+            return connection
+
+    def release(self, connection):
+        """Return a checked out connection, rolled back"""
+        if os.getpid() != self.pid: #forked, the parent owns the socket
+            return
+        status = extensions.TRANSACTION_STATUS_UNKNOWN
+        if not connection.closed:
+            status = connection.get_transaction_status()
+        reusable = status != extensions.TRANSACTION_STATUS_UNKNOWN
+        if reusable and status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                reusable = False
+        now = time.monotonic()
+        created = self._created.get(id(connection), now)
+        if not reusable or now - created >= self.max_lifetime:
+            self._forget(connection)
+            return
+
+        with self._condition:
+            self._idle.append((connection, created, now))
+            expired = self._expired(now)
+            self._condition.notify()
+        for stale in expired:
+            self._forget(stale)
+
+    def discard(self, connection):
+        """Close a checked out connection instead of returning it"""
+        self._forget(connection)
+
+    def close(self):
+        """Close the idle connections, checked out ones when returned"""
+        with self._condition:
+            idle = [connection for connection, _c, _r in self._idle]
+            self._idle.clear()
+            self.max_lifetime = 0
+        for connection in idle:
+            self._forget(connection)
+
+    def _healthy(self, connection, created, returned):
+        now = time.monotonic()
+        if connection.closed or now - created >= self.max_lifetime or \
+                now - returned >= self.max_idle:
+            return False
+        if now - returned < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except psycopg2.Error:
+            with self._condition:
+                self._counters['failed_checks'] += 1
+            return False
+
+        return True
+
+    def _expired(self, now):
+        """Take the connections idle for too long, oldest are first"""
+        expired = []
+        while self._idle and now - self._idle[0][2] >= self.max_idle:
+            expired.append(self._idle.popleft()[0])
+
+        return expired
+
+    def _checked_out(self, waited_for, waited):
+        with self._condition:
+            self._counters['checkouts'] += 1
+            self._counters['wait_ns'] += int(waited_for * 1e9)
+            if waited:
+                self._counters['waits'] += 1
+            self._max_wait = max(self._max_wait, waited_for)
+
+    def _forget(self, connection):
+        """Close a connection that is no longer counted against the pool"""
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        if connection is not None:
+            self._close(connection)
+
+    def _close(self, connection):
+        with self._condition:
+            self._created.pop(id(connection), None)
+            self._counters['destroyed'] += 1
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, params, connect, **options):
+    """The process's pool for the alias, created on first use
+
+    A pool is for one set of connection params, if they change the pool
+    is closed and replaced.
+    """
+    with _pools_lock:
+        pool = _pools.get(alias)
+        stale = pool is not None and pool.params != params and \
+            pool.pid == os.getpid()
+        if pool is None or stale or pool.pid != os.getpid():
+            if stale:
+                pool.close()
+            pool = _pools[alias] = ConnectionPool(connect, **options)
+            pool.params = params
+
+    return pool
+
+
+def close_pools():
+    """Close every idle pooled connection of the process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """{alias: stats} of the process's pools"""
+    with _pools_lock:
+        return {key: pool.stats() for key, pool in _pools.items()}
@@ -0,0 +1,81 @@
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+
+from core.db.pool import close_pools, get_pool
+
+
+#DATABASES[alias]['POOL'] keys and ConnectionPool arguments
+POOL_OPTIONS = {
+    'MAX_SIZE': 'max_size',
+    'TIMEOUT': 'timeout',
+    'MAX_LIFETIME': 'max_lifetime',
+    'MAX_IDLE': 'max_idle',
+    'CHECK_AFTER': 'check_after',
+}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        #idle pooled connections would keep the database in use
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend checking connections out of a per process pool
+
+    Closing the connection, which django does at the end of each request
+    with CONN_MAX_AGE 0, returns it to the pool rolled back. A MAX_SIZE
+    of 0 in the POOL settings turns pooling off.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @property
+    def pool_options(self):
+        settings = self.settings_dict.get('POOL') or {}
+        return {
+            argument: settings[key]
+            for key, argument in POOL_OPTIONS.items()
+            if key in settings
+        }
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        options = self.pool_options
+        if options.get('max_size', 1) <= 0:
+            return super().get_new_connection(conn_params)
+
+        self.pool = get_pool(
+            self.alias, conn_params,
+            lambda: base.Database.connect(**conn_params), **options
+        )
+        connection = self.pool.acquire()
+
+        #as the postgresql backend sets up its new connections
+        try:
+            self.isolation_level = self.settings_dict['OPTIONS'][
+                'isolation_level'
+            ]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            if self.in_atomic_block: #django keeps using it, see close()
+                pool.discard(self.connection)
+            else:
+                pool.release(self.connection)
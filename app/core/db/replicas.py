@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from asgiref.local import Local
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+#aliases of DATABASES holding copies of the default database
+REPLICAS = getattr(settings, 'DATABASE_REPLICAS', ())
+#seconds a client reads from the primary after it wrote
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+#seconds of replication lag after which a replica isn't read from
+MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 5)
+#seconds a replica's health is trusted for in each process
+CHECK_INTERVAL = getattr(settings, 'REPLICA_CHECK_INTERVAL', 5)
+#models always read from the primary, a new or revoked token is used at
+#once
+PRIMARY_MODELS = getattr(
+    settings, 'REPLICA_PRIMARY_MODELS',
+    ('authtoken.token', 'core.revokedtoken')
+)
+
+#zero unless the replica is replaying wal it hasn't caught up with. Null
+#once its wal receiver is gone, having replayed all it received says
+#nothing then. The receiver's row is visible without pg_read_all_stats.
+LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+_request = Local()
+
+
+def _client_key(request):
+    """Who made the request, by token, session or address"""
+    client = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME) or \
+        request.META.get('REMOTE_ADDR', '')
+    digest = hashlib.md5(client.encode()).hexdigest()
+
+    return f'db:primary:{digest}'
+
+
+def _user_key(user_id):
+    return f'db:primary:user:{user_id}'
+
+
+def authenticated(user):
+    """Read from the primary from now on if the user wrote recently
+
+    Called by the authentication classes, since a user can write with
+    one token or session and read with another, signed access tokens
+    change on every refresh.
+    """
+    if not hasattr(_request, 'user_id'): #outside ReplicaMiddleware
+        return
+    _request.user_id = user.pk
+    if _request.readable and cache.get(_user_key(user.pk)):
+        _request.readable = False
+
+
+class ReplicaMiddleware:
+    """Let safe requests read from replicas
+
+    Requests by a client or user that wrote within STICKY_SECONDS read
+    from the primary, so they see their own writes. The pins are kept in
+    the cache, which should be shared by every process.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not REPLICAS:
+            return self.get_response(request)
+
+        key = _client_key(request)
+        _request.replica = None
+        _request.user_id = None
+        _request.wrote = False
+        _request.readable = request.method in ('GET', 'HEAD', 'OPTIONS') \
+            and not cache.get(key)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _request.wrote or request.method not in (
+                'GET', 'HEAD', 'OPTIONS'
+            )
+            user_id = _request.user_id
+            del _request.replica, _request.user_id, _request.wrote, \
+                _request.readable
+        if wrote:
+            keys = {key: True}
+            if user_id is not None:
+                keys[_user_key(user_id)] = True
+            cache.set_many(keys, STICKY_SECONDS)
+
+        return response
+
+
+class ReplicaRouter:
+    """Route reads of safe requests to a healthy replica
+
+    Everything else, writes, reads inside transactions and reads outside
+    requests included, goes to the default database. A replica that
+    can't be queried or lags more than MAX_LAG seconds is left out until
+    its next check.
+    """
+
+    def __init__(self, replicas=None):
+        self.replicas = list(REPLICAS if replicas is None else replicas)
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not getattr(_request, 'readable', False):
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in PRIMARY_MODELS or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        if _request.replica is None: #one replica per request
+            healthy = [alias for alias in self.replicas if self.healthy(alias)]
+            _request.replica = random.choice(healthy) if healthy \
+                else DEFAULT_DB_ALIAS
+
+        return _request.replica
+
+    def db_for_write(self, model, **hints):
+        if hasattr(_request, 'wrote'):
+            _request.wrote = True
+            _request.readable = False #reads its writes from now on
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True #every database holds the same rows
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in self.replicas
+
+    def healthy(self, alias):
+        """Whether the replica was readable at its last check"""
+        now = time.monotonic()
+        with self._lock:
+            checked, healthy = self._health.get(alias, (None, False))
+        if checked is None or now - checked >= CHECK_INTERVAL:
+            healthy = self.check(alias)
+            with self._lock:
+                self._health[alias] = (now, healthy)
+
+        return healthy
+
+    def check(self, alias):
+        """Query the replica for its lag, False if it is down, behind or
+        not replicating"""
+        try:
+            lag = self.lag(alias)
+        except DatabaseError:
+            logger.warning('Replica %s is unavailable', alias, exc_info=True)
+            return False
+        if lag is None:
+            logger.warning('Replica %s is not replicating', alias)
+            return False
+        if lag > MAX_LAG:
+            logger.warning('Replica %s is %.1fs behind', alias, lag)
+            return False
+
+        return True
+
+    def lag(self, alias):
+        """Seconds the replica is behind the primary, None if it isn't
+        receiving from it"""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return 0.0
+
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+
+        return None if lag is None else float(lag)
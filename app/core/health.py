@@ -0,0 +1,134 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+
+logger = logging.getLogger(__name__)
+
+#seconds a readiness result is reused for, probes are often per second
+#from several places
+READINESS_TTL = getattr(settings, 'READINESS_TTL', 1)
+
+#aliases found fully migrated, applied migrations stay applied
+_migrated = set()
+_readiness = {}
+_readiness_lock = threading.Lock()
+
+
+class MigrationsPending(Exception):
+    """The database is reachable but not migrated"""
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Open a connection and run a probe query, raises OperationalError"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_migrations(alias=DEFAULT_DB_ALIAS):
+    """Raise MigrationsPending unless every migration is applied"""
+    if alias in _migrated:
+        return
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise MigrationsPending(
+            f'{len(plan)} migrations are not applied, '
+            f'next is {plan[0][0].app_label}.{plan[0][0].name}'
+        )
+    _migrated.add(alias)
+
+
+def backoff(initial, maximum):
+    """Delays growing exponentially up to maximum, with full jitter"""
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(maximum, initial * 2 ** attempt))
+        attempt += 1
+
+
+def wait_for_database(alias=DEFAULT_DB_ALIAS, timeout=60, initial_delay=0.1,
+                      max_delay=5, migrations=False, on_retry=None):
+    """Wait until the database answers a query and, if asked, is migrated
+
+    on_retry(error, delay) is called before each sleep. Raises the last
+    error once timeout seconds have passed.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff(initial_delay, max_delay):
+        try:
+            check_database(alias)
+            if migrations:
+                check_migrations(alias)
+            return
+        except (OperationalError, MigrationsPending) as error:
+            if not connections[alias].in_atomic_block:
+                connections[alias].close() #a fresh connection next attempt
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            delay = min(delay, remaining)
+            if on_retry is not None:
+                on_retry(error, delay)
+            time.sleep(delay)
+
+
+def readiness(alias=DEFAULT_DB_ALIAS):
+    """(ready, checks) from a database probe and the migration state,
+    reused for READINESS_TTL seconds"""
+    now = time.monotonic()
+    with _readiness_lock:
+        checked, result = _readiness.get(alias, (None, None))
+        if checked is not None and now - checked < READINESS_TTL:
+            return result
+
+    checks = {}
+    try:
+        check_database(alias)
+        checks['database'] = 'ok'
+        check_migrations(alias)
+        checks['migrations'] = 'ok'
+    #the checks are public, the errors name hosts, users and databases
+    except OperationalError:
+        logger.warning('Database %s is unavailable', alias, exc_info=True)
+        checks['database'] = 'unavailable'
+    except MigrationsPending:
+        logger.warning('Database %s is not migrated', alias, exc_info=True)
+        checks['migrations'] = 'pending'
+    result = (
+        checks.get('database') == checks.get('migrations') == 'ok', checks
+    )
+    with _readiness_lock:
+        _readiness[alias] = (now, result)
+
+    return result
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """The process is up and serving requests"""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """The database is reachable and migrated, 503 while it isn't"""
+    ready, checks = readiness()
+
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503
+    )
@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.postgresql import base
+
+from core.db.pool import close_pools, pool_stats
+from core.db.postgresql.base import DatabaseWrapper
+
+
+class Command(BaseCommand):
+    """compares connecting per request with the connection pool"""
+    help = ('Benchmark requests/s and latency of requests that each run a '
+            'query and close their connection, as django does with '
+            'CONN_MAX_AGE 0, with and without the connection pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--pool-size', type=int, default=None)
+        parser.add_argument('--query', default='SELECT 1')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if connections[DEFAULT_DB_ALIAS].vendor != 'postgresql':
+            raise CommandError('The pool is for postgresql databases.')
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        pooled = dict(settings_dict, POOL=dict(settings_dict.get('POOL', {})))
+        if options['pool_size'] is not None:
+            pooled['POOL']['MAX_SIZE'] = options['pool_size']
+
+        self.stdout.write(
+            f'{"connections":<12} {"req/s":>8} {"mean ms":>8} {"p99 ms":>8}'
+        )
+        close_pools()
+        try:
+            for name, wrapper_class, settings in (
+                    ('per request', base.DatabaseWrapper, settings_dict),
+                    ('pooled', DatabaseWrapper, pooled)):
+                self._run(name, wrapper_class, settings, options)
+            stats = pool_stats()[DEFAULT_DB_ALIAS]
+            self.stdout.write('pool ' + ' '.join(
+                f'{key} {value:.2f}' if isinstance(value, float)
+                else f'{key} {value}'
+                for key, value in stats.items()
+            ))
+        finally:
+            close_pools()
+
+    def _run(self, name, wrapper_class, settings, options):
+        """Print the throughput and latency of the requests"""
+        local = threading.local()
+
+        def request(_number):
+            if not hasattr(local, 'wrapper'):
+                local.wrapper = wrapper_class(settings, DEFAULT_DB_ALIAS)
+            start = time.perf_counter()
+            with local.wrapper.cursor() as cursor:
+                cursor.execute(options['query'])
+                cursor.fetchall()
+            local.wrapper.close()
+            elapsed = time.perf_counter() - start
+            #contrib.postgres looks up type oids with the thread's own
+            #connection on the first connect
+            connections[DEFAULT_DB_ALIAS].close()
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            latencies = sorted(pool.map(request, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{name:<12} {len(latencies) / elapsed:>8.0f} '
+            f'{sum(latencies) * 1000 / len(latencies):>8.2f} '
+            f'{latencies[int(len(latencies) * 0.99) - 1] * 1000:>8.2f}'
+        )
@@ -0,0 +1,62 @@
+import os
+import posixpath
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe, recipe_image_path
+
+
+class Command(BaseCommand):
+    """deletes stored recipe images that no recipe references"""
+    help = ('Delete recipe image files no recipe uses any more. Files '
+            'changed within the grace period are kept, uploads may still '
+            'be about to reference them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report what would be deleted')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        storage = Recipe._meta.get_field('image').storage
+        references = Recipe.objects.image_references()
+        cutoff = time.time() - options['grace_hours'] * 3600
+        deleted = freed = 0
+
+        for name in self._files(storage, posixpath.dirname(
+                recipe_image_path(None, 'image.jpg'))):
+            if name in references:
+                continue
+            try:
+                stat = os.stat(storage.path(name))
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            if not options['dry_run']:
+                storage.delete(name)
+            deleted += 1
+            freed += stat.st_size
+
+        shared = sum(1 for count in references.values() if count > 1)
+        self.stdout.write(
+            f'{len(references)} images in use, {shared} shared by several '
+            f'recipes'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would delete" if options["dry_run"] else "Deleted"} '
+            f'{deleted} unreferenced images, {freed} bytes'
+        ))
+
+    def _files(self, storage, directory):
+        """Names of all files below the directory of the storage"""
+        try:
+            directories, files = storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self._files(storage, posixpath.join(directory, name))
@@ -1,22 +1,53 @@
-import time
-
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import MigrationsPending, wait_for_database
 
 
 class Command(BaseCommand):
     """makes django to pause execution untill postgres is ready"""
+    help = ('Wait until the database accepts connections and answers a '
+            'query, retrying with exponential backoff and jitter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait in total before failing.'
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+        parser.add_argument(
+            '--check-migrations', action='store_true',
+            help='Also wait until every migration is applied.'
+        )
 
     def handle(self, *args, **options):
         """Handle the command"""
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
\ No newline at end of file
+
+        def on_retry(error, delay):
+            reason = str(error).strip().splitlines()[0] if str(error) \
+                else error.__class__.__name__
+            self.stdout.write(
+                f'Database unavailable ({reason}), '
+                f'waiting {delay:.2f} seconds...'
+            )
+
+        try:
+            wait_for_database(
+                options['database'],
+                timeout=options['timeout'],
+                initial_delay=options['initial_delay'],
+                max_delay=options['max_delay'],
+                migrations=options['check_migrations'],
+                on_retry=on_retry,
+            )
+        except (OperationalError, MigrationsPending) as error:
+            raise CommandError(
+                f'Database not ready after {options["timeout"]} seconds: '
+                f'{error}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Database available!'))
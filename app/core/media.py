@@ -0,0 +1,192 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+#'x-accel-redirect' (nginx) or 'x-sendfile' (apache, lighttpd) hand the
+#file to the front end server, anything else streams it from django
+MEDIA_SERVE_MODE = getattr(settings, 'MEDIA_SERVE_MODE', '')
+#internal nginx location aliased to MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = getattr(
+    settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/'
+)
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 3600)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+#names given by core.storage.ContentAddressedStorage
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64})\.\w+$')
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Read only length bytes of a file from start
+
+    The file number is kept, so a wsgi.file_wrapper can still sendfile the
+    Content-Length bytes from the current offset.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header, size):
+    """Return (first, last) byte of a single range Range header
+
+    None means the whole file is sent, which is what headers with several
+    or malformed ranges get. Raises ValueError if the range can't be
+    satisfied.
+    """
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first: #the last bytes of the file
+        if int(last) == 0:
+            raise ValueError('empty suffix range')
+        return max(size - int(last), 0), size - 1
+
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError('range starts past the end of the file')
+    last = int(last) if last else size - 1
+
+    return first, min(last, size - 1)
+
+
+def _offload(path, content_type):
+    """Response telling the front end server to send the file, if set up"""
+    if MEDIA_SERVE_MODE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    if MEDIA_SERVE_MODE == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT)
+        if relative.startswith(os.pardir):
+            return None
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(
+            relative.replace(os.sep, '/')
+        )
+        return response
+
+    return None
+
+
+def _stream(request, path, size, content_type, etag, last_modified):
+    """Stream the file or the requested range of it"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    try:
+        requested = None
+        if not if_range or if_range in (etag, last_modified):
+            requested = byte_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = requested
+        response = FileResponse(
+            FileRange(file, first, last - first + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = last - first + 1
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+def file_response(request, path, content_type=None, etag=None,
+                  immutable=False, max_age=MEDIA_MAX_AGE):
+    """Respond with the file at path
+
+    Conditional requests are answered from the file's metadata, the file
+    is then handed to the front end server when MEDIA_SERVE_MODE is set
+    or streamed with byte range support. The etag defaults to one made of
+    the modification time and size, immutable is for paths whose content
+    never changes.
+    """
+    try:
+        status = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404
+    if etag is None:
+        etag = '"%x-%x"' % (status.st_mtime_ns, status.st_size)
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or \
+            'application/octet-stream'
+    last_modified = http_date(status.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(status.st_mtime)
+    )
+    if response is None:
+        response = _offload(path, content_type) or _stream(
+            request, path, status.st_size, content_type, etag, last_modified
+        )
+
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    if immutable:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Serve a file below MEDIA_ROOT
+
+    Content addressed files are cached for good, their hash is the etag.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    match = CONTENT_ADDRESSED.match(os.path.basename(path))
+    if match:
+        return file_response(
+            request, full_path, etag=f'"{match.group(1)}"', immutable=True
+        )
+
+    return file_response(request, full_path)
@@ -0,0 +1,52 @@
+# Generated by Django 3.0.14 on 2026-10-18 14:45
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+BACKFILL_SQL = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector('english', r.title), 'A') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_recipe_tags rt
+        JOIN core_tag t ON t.id = rt.tag_id WHERE rt.recipe_id = r.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_recipe_ingredients ri
+        JOIN core_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'C');
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index the search vector and fill it for existing recipes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_idx ON core_recipe '
+        'USING gin (search_vector);'
+    )
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_search_idx;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
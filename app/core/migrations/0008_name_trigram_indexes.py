@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:02
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = (
+    ('core_tag_name_trgm_idx', 'core_tag'),
+    ('core_ingredient_name_trgm_idx', 'core_ingredient'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN trigram index the names used by the typeahead lookups"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON {table} USING gin (name gin_trgm_ops);'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name};')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
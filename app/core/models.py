@@ -1,17 +1,28 @@
-import uuid
 import os
 
-from django.db import models
+from django.db import models, connections
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import IStartsWith
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector, SearchVectorField, \
+                                           TrigramSimilarity
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                          PermissionsMixin
 from django.conf import settings
 
+from core.storage import image_storage
+
+
+SEARCH_CONFIG = 'english'
+
 
 def recipe_image_path(instance, filename):
     
-    """generates path for each recipe image"""
+    """generates path for each recipe image, the file itself is named by
+    its content hash in image_storage"""
     ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    filename = f'image.{ext}'
 
     return os.path.join('uploads/recipe/', filename)
 
@@ -47,6 +58,76 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+@models.CharField.register_lookup
+class IPrefix(models.Lookup):
+    """istartswith as ILIKE on postgres, which a gin_trgm_ops index on the
+    column serves, UPPER(column) LIKE needs an index of its own"""
+    lookup_name = 'iprefix'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        return IStartsWith(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        #the pattern, escaped and with the trailing %
+        rhs, rhs_params = IStartsWith(self.lhs, self.rhs).process_rhs(
+            compiler, connection
+        )
+
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+
+class RecipeAttrQuerySet(models.QuerySet):
+    """Queries shared by the user owned recipe attributes"""
+
+    def _usages(self):
+        """Recipe links of the object from the outer query"""
+        through = self.model.recipe_set.through
+        return through.objects.filter(
+            **{self.model._meta.model_name: models.OuterRef('pk')}
+        )
+
+    def assigned(self):
+        """Objects used by a recipe, as an EXISTS semi-join"""
+        return self.filter(models.Exists(self._usages()))
+
+    def with_recipe_count(self):
+        """Annotate the number of recipes using each object"""
+        counts = self._usages().order_by().values(
+            self.model._meta.model_name
+        ).annotate(count=models.Count('pk')).values('count')
+
+        return self.annotate(recipe_count=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0
+        ))
+
+    def typeahead(self, text, limit):
+        """Top objects whose name starts with or resembles the text
+
+        Prefix matches come first. On postgres the rest are ranked by
+        trigram similarity, the prefix ILIKE and the similarity filter are
+        both served by the name trigram index.
+        """
+        prefix = models.Case(
+            models.When(name__iprefix=text, then=models.Value(1)),
+            default=models.Value(0),
+            output_field=models.IntegerField(),
+        )
+        if connections[self.db].vendor != 'postgresql':
+            return self.filter(name__icontains=text).annotate(
+                prefix=prefix
+            ).order_by('-prefix', 'name')[:limit]
+
+        return self.filter(
+            models.Q(name__iprefix=text) |
+            models.Q(name__trigram_similar=text)
+        ).annotate(
+            prefix=prefix,
+            similarity=TrigramSimilarity('name', text),
+        ).order_by('-prefix', '-similarity', 'name')[:limit]
+
+
 class Tag(models.Model):
     """Tag for a recipe"""
     name = models.CharField(max_length=255)
@@ -54,6 +135,15 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )#assign the tag and delete the tag when user is deleted
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_tag_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -65,12 +155,119 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_ingredient_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+class RecipeQuerySet(models.QuerySet):
+    """Queries for recipes"""
+
+    def _links(self, field):
+        """Through table rows of the m2m field and the name of its target"""
+        m2m = self.model._meta.get_field(field)
+        through = m2m.remote_field.through
+
+        return through.objects.order_by(), m2m.m2m_reverse_field_name()
+
+    def linked_to(self, field, ids, match_all=False):
+        """Recipes linked through the m2m field to any or all of the ids"""
+        links, target = self._links(field)
+        ids = set(ids)
+        links = links.filter(**{f'{target}__in': ids})
+        if match_all:
+            #one row per recipe having a link to every id, no joins needed
+            matching = links.values('recipe').annotate(
+                matched=models.Count('pk')
+            ).filter(matched=len(ids)).values('recipe')
+            return self.filter(pk__in=matching)
+
+        return self.filter(
+            models.Exists(links.filter(recipe=models.OuterRef('pk')))
+        )
+
+    def _linked_names(self, field):
+        """Space separated names of the objects linked to the outer recipe"""
+        links, target = self._links(field)
+        names = links.filter(recipe=models.OuterRef('pk')).values(
+            'recipe'
+        ).annotate(names=StringAgg(f'{target}__name', ' ')).values('names')
+
+        return models.Subquery(names, output_field=models.TextField())
+
+    def update_search_vector(self):
+        """Recompute the full text search vector of the recipes"""
+        if connections[self.db].vendor != 'postgresql':
+            return 0 #search() falls back to matching the columns directly
+
+        return self.update(search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(
+                self._linked_names('tags'), weight='B', config=SEARCH_CONFIG
+            ) +
+            SearchVector(
+                self._linked_names('ingredients'),
+                weight='C',
+                config=SEARCH_CONFIG
+            )
+        ))
+
+    def image_references(self):
+        """Number of recipes using each stored image, by image name"""
+        return dict(
+            self.exclude(image='').exclude(image__isnull=True).order_by()
+            .values('image').annotate(references=models.Count('pk'))
+            .values_list('image', 'references')
+        )
+
+    def search(self, text):
+        """Recipes whose title, tag or ingredient names match the text
+
+        On postgres the matches are annotated with their rank.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            tags, _ = self._links('tags')
+            ingredients, _ = self._links('ingredients')
+            return self.filter(
+                models.Q(title__icontains=text) |
+                models.Q(models.Exists(tags.filter(
+                    recipe=models.OuterRef('pk'), tag__name__icontains=text
+                ))) |
+                models.Q(models.Exists(ingredients.filter(
+                    recipe=models.OuterRef('pk'),
+                    ingredient__name__icontains=text
+                )))
+            )
+
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        rank = SearchRank(models.F('search_vector'), query)
+
+        return self.filter(search_vector=query).annotate(
+            rank=Cast(rank, models.FloatField()) #float4 does not round trip
+        )
+
+
 class Recipe(models.Model):
     """Recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -81,7 +278,35 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient') #abv classes
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_path)
+    #files are shared by recipes with the same image, indexed to count them
+    image = models.ImageField(
+        null=True, upload_to=recipe_image_path, storage=image_storage,
+        db_index=True
+    )
+    #set by recipies.images while the uploaded image is processed
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    #maintained by core.signals, title and tag/ingredient names
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_recipe_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.title                
+
+
+class RevokedToken(models.Model):
+    """A signed token revoked before it expires, see user.tokens"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires = models.DateTimeField(db_index=True)
 
     def __str__(self):
-        return self.title                
\ No newline at end of file
+        return self.jti
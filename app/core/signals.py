@@ -0,0 +1,72 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+
+
+#recipe m2m field linking each recipe attribute model
+RECIPE_FIELDS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Refresh the search vector of a saved recipe"""
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Refresh the search vector and modification time of recipes
+    gaining or losing links"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _links_changed(Recipe.objects.filter(pk=instance.pk))
+        return
+
+    #instance is a tag or ingredient, pk_set holds recipe ids
+    if action == 'pre_clear':
+        instance._linked_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_linked_recipe_ids', ())
+        _links_changed(Recipe.objects.filter(pk__in=recipe_ids))
+    elif action in ('post_add', 'post_remove'):
+        _links_changed(Recipe.objects.filter(pk__in=pk_set))
+
+
+def _links_changed(recipes):
+    """Refresh recipes whose tags or ingredients changed"""
+    recipes.update(updated_at=timezone.now())
+    recipes.update_search_vector()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+    """Refresh the recipes using a renamed tag or ingredient"""
+    if not created:
+        Recipe.objects.linked_to(
+            RECIPE_FIELDS[sender], [instance.pk]
+        ).update_search_vector()
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleting(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient before its links go"""
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, **kwargs):
+    """Refresh the recipes that used a deleted tag or ingredient"""
+    recipe_ids = instance.__dict__.pop('_linked_recipe_ids', ())
+    Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the hash of their content
+
+    Only the directory and extension of the name asked for are kept.
+    Saving content that is already stored writes nothing and returns the
+    existing name, so identical files are stored once however often they
+    are saved. Files are never deleted on behalf of one user, see the
+    gc_images command.
+    """
+
+    def content_name(self, name, content):
+        """Storage name of the content, saved under name"""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+
+        return os.path.join(
+            os.path.dirname(name), digest[:2], f'{digest}{extension}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            #fresh files are spared by gc_images until they are referenced
+            os.utime(self.path(name))
+            return name
+
+        return super().save(name, content, max_length)
+
+    def _save(self, name, content):
+        #written under a temporary name and renamed in place, so a name
+        #never holds part of a file
+        temp_name = super()._save(posixpath.join(
+            posixpath.dirname(name), f'.{uuid.uuid4().hex}.part'
+        ), content)
+        os.replace(self.path(temp_name), self.path(name))
+
+        return name
+
+
+image_storage = ContentAddressedStorage()
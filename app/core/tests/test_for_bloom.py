@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+
+from core.bloom import BloomFilter
+
+
+class BloomFilterTests(SimpleTestCase):
+    """Test the bloom filter"""
+
+    def test_added_items_found(self):
+        """Test every item added is reported present"""
+        bloom = BloomFilter(1000)
+        items = [f'item{number}' for number in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        self.assertTrue(all(item in bloom for item in items))
+        self.assertEqual(bloom.count, 1000)
+
+    def test_false_positive_rate(self):
+        """Test other items are rarely reported present at capacity"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for number in range(1000):
+            bloom.add(f'item{number}')
+
+        false_positives = sum(
+            f'other{number}' in bloom for number in range(10000)
+        )
+
+        self.assertLess(false_positives, 300)
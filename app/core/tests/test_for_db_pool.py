@@ -0,0 +1,211 @@
+import threading
+import time
+from io import StringIO
+from unittest import skipUnless
+
+import psycopg2
+from psycopg2 import extensions
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """The parts of a psycopg2 connection the pool uses"""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.broken = False
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test checking connections in and out of the pool"""
+
+    def pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, **options)
+
+    def test_connection_reused(self):
+        """Test a returned connection is handed out again"""
+        pool = self.pool()
+
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_bounded(self):
+        """Test checkouts of a full pool time out"""
+        pool = self.pool(max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waits_for_release(self):
+        """Test a checkout of a full pool gets the next returned one"""
+        pool = self.pool(max_size=1, timeout=5)
+        held = pool.acquire()
+        releaser = threading.Timer(0.05, pool.release, [held])
+        releaser.start()
+
+        connection = pool.acquire()
+        releaser.join()
+
+        self.assertIs(connection, held)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_ms_max'], 0)
+
+    def test_rolled_back_on_release(self):
+        """Test an open transaction is not handed to the next user"""
+        pool = self.pool()
+        connection = pool.acquire()
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+
+        pool.release(connection)
+
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.acquire(), connection)
+
+    def test_broken_connection_replaced(self):
+        """Test connections in an unknown state are closed on release"""
+        pool = self.pool()
+        connection = pool.acquire()
+        connection.status = extensions.TRANSACTION_STATUS_UNKNOWN
+
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.stats()['destroyed'], 1)
+
+    def test_idle_connection_checked(self):
+        """Test connections failing the probe query are replaced"""
+        pool = self.pool(check_after=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.broken = True
+
+        replacement = pool.acquire()
+
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['failed_checks'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_old_connections_closed(self):
+        """Test connections past their lifetime are not reused"""
+        pool = self.pool(max_lifetime=0)
+        connection = pool.acquire()
+
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_idle_connections_expire(self):
+        """Test connections idle for too long are closed"""
+        pool = self.pool(max_idle=0.01)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        time.sleep(0.02)
+
+        pool.release(second)
+
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+
+    def test_close(self):
+        """Test closing the pool closes idle and returned connections"""
+        pool = self.pool()
+        idle, held = pool.acquire(), pool.acquire()
+        pool.release(idle)
+
+        pool.close()
+        pool.release(held)
+
+        self.assertTrue(idle.closed)
+        self.assertTrue(held.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'pooled on postgres only')
+class PooledBackendTests(SimpleTestCase):
+    """Test the postgresql backend returns connections to its pool"""
+    databases = {'default'}
+
+    def test_connection_returned_on_close(self):
+        """Test closing and reconnecting reuses the database connection"""
+        default = connections['default']
+        wrapper = default.__class__(default.settings_dict, alias='default')
+        try:
+            wrapper.ensure_connection()
+            raw = wrapper.connection
+            wrapper.close()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+            self.assertIs(wrapper.connection, raw)
+            self.assertGreaterEqual(wrapper.pool.stats()['checkouts'], 2)
+        finally:
+            wrapper.close()
+
+    def test_benchmark(self):
+        """Test both ways of connecting are timed and pool stats printed"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_db_pool', requests=20, concurrency=2, stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('created', lines[3])
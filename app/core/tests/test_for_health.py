@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthEndpointTests(TestCase):
+    """Test the liveness and readiness endpoints"""
+
+    def setUp(self):
+        health._readiness.clear()
+        health._migrated.clear()
+
+    def test_healthz(self):
+        """Test liveness is answered without the database"""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+        self.assertIn('no-cache', res['Cache-Control'])
+
+    def test_readyz(self):
+        """Test a reachable, migrated database is ready"""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['checks'],
+                         {'database': 'ok', 'migrations': 'ok'})
+
+    def test_readyz_reused(self):
+        """Test frequent probes reuse the last result"""
+        self.client.get(READYZ_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz_database_down(self):
+        """Test an unreachable database is reported with a 503"""
+        error = OperationalError(
+            'could not connect to server: Connection refused\n'
+            'Is the server running on host "db.internal" and accepting\n'
+            'TCP/IP connections on port 5432?'
+        )
+        with patch('core.health.check_database', side_effect=error), \
+                self.assertLogs('core.health', 'WARNING'):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['checks'], {'database': 'unavailable'})
+        self.assertNotIn(b'db.internal', res.content)
+
+    def test_readyz_migrations_pending(self):
+        """Test an unmigrated database is not ready"""
+        with patch('core.health.check_migrations',
+                   side_effect=health.MigrationsPending('1 pending')), \
+                self.assertLogs('core.health', 'WARNING'):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['checks']['migrations'], 'pending')
+
+    def test_unsafe_methods_rejected(self):
+        """Test probes are GET or HEAD only"""
+        res = self.client.post(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 405)
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recipe
+from core.storage import image_storage
+
+
+class ContentAddressedImageTests(TestCase):
+    """Test recipe images are stored once per content"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user('cas@x.com', 'pw')
+
+    def recipe(self, content=None):
+        recipe = Recipe.objects.create(
+            user=self.user, title='puttu', time_minutes=10, price=1
+        )
+        if content is not None:
+            recipe.image.save('photo.JPG', ContentFile(content))
+
+        return recipe
+
+    def test_identical_images_stored_once(self):
+        """Test the same content is saved to one content hash name"""
+        first, second = self.recipe(b'same'), self.recipe(b'same')
+        other = self.recipe(b'different')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        directory = os.path.dirname(image_storage.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_image_references(self):
+        """Test recipes are counted per stored image"""
+        first = self.recipe(b'shared')
+        self.recipe(b'shared')
+        self.recipe(b'single')
+        self.recipe()
+
+        references = Recipe.objects.image_references()
+
+        self.assertEqual(len(references), 2)
+        self.assertEqual(references[first.image.name], 2)
+
+    def test_gc_deletes_unreferenced_images(self):
+        """Test only old images no recipe uses are collected"""
+        kept = self.recipe(b'kept')
+        replaced = self.recipe(b'replaced')
+        old_name = replaced.image.name
+        replaced.image.save('new.jpg', ContentFile(b'new'))
+        fresh = image_storage.save('uploads/recipe/x.jpg', ContentFile(b'y'))
+        for name in (kept.image.name, old_name):
+            os.utime(image_storage.path(name), (1, 1))
+        out = StringIO()
+
+        call_command('gc_images', stdout=out)
+
+        self.assertFalse(image_storage.exists(old_name))
+        self.assertTrue(image_storage.exists(kept.image.name))
+        self.assertTrue(image_storage.exists(fresh))
+        self.assertIn('Deleted 1 unreferenced images', out.getvalue())
+
+    def test_gc_dry_run(self):
+        """Test a dry run deletes nothing"""
+        name = image_storage.save('uploads/recipe/x.jpg', ContentFile(b'z'))
+        os.utime(image_storage.path(name), (1, 1))
+
+        call_command('gc_images', dry_run=True, stdout=StringIO())
+
+        self.assertTrue(image_storage.exists(name))
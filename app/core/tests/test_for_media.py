@@ -0,0 +1,125 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from core import media
+
+
+CONTENT_HASH = 'ab' * 32
+
+
+class MediaServingTests(TestCase):
+    """Test serving files below MEDIA_ROOT"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(MEDIA_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        os.makedirs(os.path.join(root.name, 'uploads'))
+        self.root = root.name
+        for name in ('uploads/notes.txt', f'uploads/{CONTENT_HASH}.jpg'):
+            with open(os.path.join(root.name, name), 'wb') as f:
+                f.write(b'0123456789')
+
+    def get(self, path, **headers):
+        response = self.client.get(f'/media/{path}', **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        else:
+            response.body = response.content
+        return response
+
+    def test_serve_file(self):
+        """Test a file is served with an etag and a short max age"""
+        res = self.get('uploads/notes.txt')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.body, b'0123456789')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('max-age=3600', res['Cache-Control'])
+
+    def test_content_addressed_file_immutable(self):
+        """Test content addressed files are cached for good"""
+        res = self.get(f'uploads/{CONTENT_HASH}.jpg')
+
+        self.assertEqual(res['ETag'], f'"{CONTENT_HASH}"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    def test_if_none_match(self):
+        """Test a matching etag is answered with 304"""
+        res = self.get(
+            f'uploads/{CONTENT_HASH}.jpg',
+            HTTP_IF_NONE_MATCH=f'"{CONTENT_HASH}"'
+        )
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.body, b'')
+
+    def test_range(self):
+        """Test byte ranges are served partially"""
+        res = self.get('uploads/notes.txt', HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res.body, b'2345')
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(res['Content-Length'], '4')
+
+    def test_suffix_range(self):
+        """Test the last bytes of a file can be requested"""
+        res = self.get('uploads/notes.txt', HTTP_RANGE='bytes=-3')
+
+        self.assertEqual(res.body, b'789')
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end of the file is rejected"""
+        res = self.get('uploads/notes.txt', HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        """Test a range for another version of the file is ignored"""
+        res = self.get(
+            'uploads/notes.txt', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.body, b'0123456789')
+
+    def test_missing_and_outside_files(self):
+        """Test missing files, directories and paths outside are not found"""
+        for path in ('uploads/missing.txt', 'uploads', '../etc/passwd'):
+            self.assertEqual(self.get(path).status_code, 404)
+
+    def test_x_accel_redirect(self):
+        """Test nginx is told to send the file"""
+        with patch.object(media, 'MEDIA_SERVE_MODE', 'x-accel-redirect'):
+            res = self.get('uploads/notes.txt')
+
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/uploads/notes.txt'
+        )
+        self.assertEqual(res.body, b'')
+        self.assertIn('ETag', res)
+
+    def test_x_sendfile(self):
+        """Test the front end server is given the file path"""
+        with patch.object(media, 'MEDIA_SERVE_MODE', 'x-sendfile'):
+            res = self.get('uploads/notes.txt')
+
+        self.assertEqual(
+            res['X-Sendfile'], os.path.join(self.root, 'uploads/notes.txt')
+        )
+
+    def test_post_not_allowed(self):
+        """Test media is read only"""
+        res = self.client.post('/media/uploads/notes.txt')
+
+        self.assertEqual(res.status_code, 405)
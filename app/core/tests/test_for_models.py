@@ -1,6 +1,5 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from unittest.mock import patch
 
 from core import models
 
@@ -64,15 +63,26 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test that image is saved in the correct location"""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_path(None, 'image.jpg')
+    def test_recipe_file_name(self):
+        """Test that image is saved in the correct location, the storage
+        names it by content"""
+        file_path = models.recipe_image_path(None, 'photo.jpg')
 
-        exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)        
+        exp_path = 'uploads/recipe/image.jpg'
+        self.assertEqual(file_path, exp_path)
 
-        
-            
\ No newline at end of file
+
+    def test_recipe_updated_at_follows_tags(self):
+        """Test changing the tags of a recipe updates its timestamp"""
+        user = dummy_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='kerala fish curry',
+            time_minutes=40,
+            price=12.00
+        )
+        created_at = recipe.updated_at
+        recipe.tags.add(models.Tag.objects.create(user=user, name='fish'))
+
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, created_at)
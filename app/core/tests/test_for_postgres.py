@@ -1,26 +1,67 @@
+from itertools import islice
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core import health
+
 
 class CommandsTestCase(TestCase):
     """ test cases for helper commands to avoid django tries to connect ,before postgres is ready"""
-    
+
+    def setUp(self):
+        health._migrated.clear()
+
     def test_wait_for_db_ready(self):
         """mocking condition where postgres is ready when django tries to connect"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True ##sets the connectionn handlerr return value to succesful
+        with patch('core.health.check_database') as cd, \
+                patch('time.sleep') as ts:
             call_command('wait_for_postgres')#custom command added in core
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(cd.call_count, 1)
+            self.assertEqual(ts.call_count, 0)
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         """simulate conddition where postgres is not ready for the first 5 connect request"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True] ##returns error for first 5 times
+        with patch('core.health.check_database') as cd:
+            cd.side_effect = [OperationalError] * 5 + [None] ##fails the first 5 probes
             call_command('wait_for_postgres')
-            self.assertEqual(gi.call_count, 6)
\ No newline at end of file
+            self.assertEqual(cd.call_count, 6)
+            self.assertEqual(ts.call_count, 5)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_timeout(self, ts):
+        """the command fails once the timeout has passed"""
+
+        with patch('core.health.check_database') as cd:
+            cd.side_effect = OperationalError('connection refused')
+            with self.assertRaises(CommandError):
+                call_command('wait_for_postgres', timeout=0)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_migrations(self, ts):
+        """waits until the migrations are applied when asked to"""
+
+        with patch('core.health.check_migrations') as cm:
+            cm.side_effect = [health.MigrationsPending('1 pending'), None]
+            call_command('wait_for_postgres', check_migrations=True)
+            self.assertEqual(cm.call_count, 2)
+
+    def test_wait_for_real_db(self):
+        """the test database accepts a probe query and is migrated"""
+        call_command('wait_for_postgres', check_migrations=True)
+
+        self.assertIn('default', health._migrated)
+
+    def test_backoff(self):
+        """delays grow exponentially up to the maximum, jittered below it"""
+        delays = list(islice(health.backoff(1, 8), 6))
+
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, min(8, 2 ** attempt))
+            self.assertGreaterEqual(delay, 0)
@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db.utils import OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from rest_framework.authtoken.models import Token
+
+from core.db.replicas import ReplicaMiddleware, ReplicaRouter, \
+    authenticated
+from core.models import Recipe, User
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """Test reads of safe requests are routed to replicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter(replicas=['replica'])
+        patcher = patch.object(self.router, 'check', return_value=True)
+        self.check = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('core.db.replicas.REPLICAS', ['replica'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method='get', token='first', write=False,
+                model=Recipe, user_id=None):
+        """Return the database a read made during the request went to"""
+        databases = []
+
+        def view(request):
+            if user_id is not None:
+                authenticated(User(pk=user_id))
+            if write:
+                self.router.db_for_write(model)
+            databases.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)(
+            '/api/recipies/recipies/', HTTP_AUTHORIZATION=f'Token {token}'
+        )
+        ReplicaMiddleware(view)(request)
+
+        return databases[0]
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from the replica"""
+        self.assertEqual(self.request(), 'replica')
+
+    def test_unsafe_request_reads_primary(self):
+        """Test reads of POST requests go to the primary"""
+        self.assertEqual(self.request('post'), 'default')
+
+    def test_reads_after_write_read_primary(self):
+        """Test a request reads what it wrote"""
+        self.assertEqual(self.request(write=True), 'default')
+
+    def test_client_sticks_to_primary_after_writing(self):
+        """Test the writing client reads from the primary for a while"""
+        self.request('post', token='writer')
+
+        self.assertEqual(self.request(token='writer'), 'default')
+        self.assertEqual(self.request(token='reader'), 'replica')
+
+    def test_user_sticks_to_primary_with_a_new_token(self):
+        """Test the pin follows the user, whose signed tokens change"""
+        self.request('post', token='old', user_id=1)
+
+        self.assertEqual(self.request(token='new', user_id=1), 'default')
+        self.assertEqual(self.request(token='new', user_id=2), 'replica')
+
+    def test_authenticated_outside_requests(self):
+        """Test authenticating outside the middleware pins nothing"""
+        authenticated(User(pk=1))
+
+        self.assertEqual(self.request(user_id=1), 'replica')
+
+    def test_stickiness_expires(self):
+        """Test the client reads from replicas again after the window"""
+        with patch('core.db.replicas.STICKY_SECONDS', 0):
+            self.request('post', token='writer')
+
+        self.assertEqual(self.request(token='writer'), 'replica')
+
+    def test_outside_requests_read_primary(self):
+        """Test commands and background work read from the primary"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_primary_models(self):
+        """Test tokens are always read from the primary"""
+        self.assertEqual(self.request(model=Token), 'default')
+
+    def test_unhealthy_replica_skipped(self):
+        """Test reads fall back to the primary while the replica is down"""
+        self.check.return_value = False
+
+        self.assertEqual(self.request(), 'default')
+        self.assertEqual(self.request(), 'default')
+        self.assertEqual(self.check.call_count, 1)
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run on the primary"""
+        self.assertFalse(self.router.allow_migrate('replica', 'core'))
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+
+
+class ReplicaHealthTests(SimpleTestCase):
+    """Test replicas are checked for availability and lag"""
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = ReplicaRouter(replicas=['default'])
+
+    def test_up_to_date(self):
+        """Test a database that isn't replaying is not behind"""
+        self.assertEqual(self.router.lag('default'), 0)
+        self.assertTrue(self.router.check('default'))
+
+    def test_down(self):
+        """Test a replica that can't be queried is unhealthy"""
+        with patch.object(self.router, 'lag', side_effect=OperationalError):
+            self.assertFalse(self.router.check('default'))
+
+    def test_lagging(self):
+        """Test a replica too far behind is unhealthy"""
+        with patch.object(self.router, 'lag', return_value=60.0):
+            self.assertFalse(self.router.check('default'))
+
+    def test_not_replicating(self):
+        """Test a replica that stopped receiving wal is unhealthy"""
+        with patch.object(self.router, 'lag', return_value=None), \
+                self.assertLogs('core.db.replicas', 'WARNING'):
+            self.assertFalse(self.router.check('default'))
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RecipiesConfig(AppConfig):
     name = 'recipies'
+
+    def ready(self):
+        from recipies import signals  # noqa: F401
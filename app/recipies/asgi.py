@@ -0,0 +1,237 @@
+import io
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.module_loading import import_string
+
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from recipies import caching
+from user.authentication import CachedTokenAuthentication, token_cache, \
+    token_expired
+
+
+logger = logging.getLogger(__name__)
+
+#middleware run around the responses answered here, their process_request
+#may answer instead (a redirect, a refusal) and their process_response
+#adds its headers
+APPLIED_MIDDLEWARE = (
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+#middleware with nothing to do for a cached, token authenticated read
+SKIPPED_MIDDLEWARE = {
+    'core.db.replicas.ReplicaMiddleware':
+        'no database reads, tokens are read from the primary',
+    'django.contrib.sessions.middleware.SessionMiddleware':
+        'the session is never used',
+    'django.middleware.csrf.CsrfViewMiddleware': 'only safe methods',
+    'django.contrib.auth.middleware.AuthenticationMiddleware':
+        'token authentication',
+    'django.contrib.messages.middleware.MessageMiddleware':
+        'no messages',
+}
+
+
+def database_sync_to_async(func):
+    """Run func on a worker thread, closing broken or expired connections
+    around it as django does around a request"""
+    def run(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def _cache_call(func, *args):
+    #the in process cache does no io, anything else is waited for off the
+    #event loop
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return func(*args)
+    return await sync_to_async(func, thread_sensitive=False)(*args)
+
+
+class RecipeReadApp:
+    """ASGI application answering cached recipe, tag and ingredient
+    list and retrieve requests without leaving the event loop
+
+    Django 3.0 runs every view on a thread, so requests the response
+    cache can answer are served here from the token and response caches,
+    with the same body, ETag and 304s as recipies.caching.
+    CachedResponseMixin. The database is only used for token lookups the
+    cache misses, on a worker thread. Everything else, misses included,
+    goes to the fallback application, which fills the cache.
+
+    The request goes through the APPLIED_MIDDLEWARE of MIDDLEWARE. If
+    MIDDLEWARE has one that is neither applied nor in SKIPPED_MIDDLEWARE
+    every request goes to the fallback.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.negotiator = DefaultContentNegotiation()
+        self._paths = None
+        self._middleware = None
+
+    def paths(self):
+        """Regular expression matching the paths served here"""
+        if self._paths is None:
+            lists = [
+                re.escape(reverse(f'recipies:{name}-list'))
+                for name in ('recipe', 'tag', 'ingredient')
+            ]
+            self._paths = re.compile(r'^(?:%s|%s\d+/)$' % (
+                '|'.join(lists), lists[0]
+            ))
+
+        return self._paths
+
+    def middleware(self):
+        """Instances of the applied middleware in MIDDLEWARE order, None if
+        one the fast path doesn't know of is installed"""
+        if self._middleware is None:
+            unknown = [
+                path for path in settings.MIDDLEWARE
+                if path not in APPLIED_MIDDLEWARE and
+                path not in SKIPPED_MIDDLEWARE
+            ]
+            if unknown:
+                logger.warning('Cached reads go to django, %s may need to '
+                               'run for them', ', '.join(unknown))
+                self._middleware = ()
+            else:
+                self._middleware = tuple(
+                    import_string(path)(lambda request: None)
+                    for path in settings.MIDDLEWARE
+                    if path in APPLIED_MIDDLEWARE
+                )
+
+        return self._middleware or None
+
+    async def __call__(self, scope, receive, send):
+        response = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') \
+                and not scope.get('root_path') \
+                and self.paths().match(scope['path']):
+            response = await self.cached_response(scope)
+        if response is None:
+            return await self.fallback(scope, receive, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response.items()
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': response.content if scope['method'] == 'GET' else b'',
+        })
+
+    async def cached_response(self, scope):
+        """The response from the response cache, or None"""
+        middleware = self.middleware()
+        if middleware is None or not caching.enabled():
+            return None
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            for instance in middleware:
+                if hasattr(instance, 'process_request') and \
+                        instance.process_request(request) is not None:
+                    return None #a redirect, django gives the same
+            host = request.get_host()
+        except Exception: #DisallowedHost, PermissionDenied
+            return None
+        renderer, media_type = self.renderer(request)
+        if renderer is None:
+            return None
+        user = await self.user(request.META.get('HTTP_AUTHORIZATION'))
+        if user is None:
+            return None
+
+        version, modified = await _cache_call(
+            caching.collection_state, user.pk
+        )
+        key = caching.cache_key(
+            user.pk, version, host, request.path, request.GET
+        )
+        etag = caching.response_etag(key)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(modified)
+        )
+        if response is None:
+            data = await _cache_call(cache.get, key)
+            if data is None:
+                return None
+            response = HttpResponse(
+                renderer.render(data, media_type, {}),
+                content_type=renderer.media_type
+            )
+        elif response.status_code != 304:
+            return None
+        caching.set_validators(response, etag, modified)
+        patch_vary_headers(response, ('Accept',))
+
+        for instance in reversed(middleware):
+            if hasattr(instance, 'process_response'):
+                response = instance.process_response(request, response)
+
+        return response
+
+    def renderer(self, request):
+        """(renderer, media type) content negotiation picks, as the
+        viewsets do, renderer is None unless it is JSON"""
+        renderers = [
+            renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        ]
+        try:
+            renderer, media_type = self.negotiator.select_renderer(
+                Request(request), renderers
+            )
+        except APIException:
+            return None, None
+        if not isinstance(renderer, JSONRenderer):
+            return None, None
+
+        return renderer, media_type
+
+    async def user(self, authorization):
+        """The user of the token in the Authorization header, or None"""
+        auth = (authorization or '').split()
+        if len(auth) != 2 or auth[0].lower() != 'token':
+            return None
+        key = auth[1]
+
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                cached = await database_sync_to_async(
+                    CachedTokenAuthentication().authenticate_credentials
+                )(key)
+            except AuthenticationFailed:
+                return None
+        if token_expired(cached[1]):
+            return None #django answers with the 401
+
+        return cached[0]
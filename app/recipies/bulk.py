@@ -0,0 +1,169 @@
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipies import caching
+from recipies.serializer import RecipeBulkItemSerializer
+
+
+#m2m field of the recipe, model it links to and the through table column
+RELATIONS = (
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+)
+
+
+class RecipeBulkWriter:
+    """Validate and write many recipes of a user with batched queries
+
+    Referenced tags and ingredients are resolved with one IN query per
+    type, recipes and their links are written with bulk_create and
+    everything happens in one transaction. Items are validated first and
+    nothing is written unless every item is valid.
+    """
+    batch_size = 1000
+
+    def __init__(self, user):
+        self.user = user
+        self.errors = []
+
+    def _owned_ids(self, model, ids):
+        """Return which of the ids belong to the user, in one query"""
+        return set(model.objects.filter(
+            user=self.user, id__in=ids
+        ).values_list('id', flat=True))
+
+    def validate(self, items, partial=False):
+        """Return the validated items, errors holds one dict per item"""
+        if not isinstance(items, list):
+            self.errors = [{'non_field_errors': [_('Expected a list')]}]
+            return []
+
+        #one serializer for all items, its fields are only built once
+        item_serializer = RecipeBulkItemSerializer(partial=partial)
+        validated, self.errors = [], []
+        for item in items:
+            try:
+                validated.append(item_serializer.run_validation(item))
+                self.errors.append({})
+            except ValidationError as exc:
+                validated.append({})
+                self.errors.append(dict(exc.detail))
+
+        for field, model, _column in RELATIONS:
+            referenced = {
+                pk for data in validated for pk in data.get(field, ())
+            }
+            owned = self._owned_ids(model, referenced)
+            for data, errors in zip(validated, self.errors):
+                missing = sorted(set(data.get(field, ())) - owned)
+                if missing:
+                    errors[field] = [
+                        _('Invalid pk "%s" - object does not exist.') % pk
+                        for pk in missing
+                    ]
+
+        if partial:
+            recipe_ids = {data.get('id') for data in validated}
+            existing = self._owned_ids(Recipe, recipe_ids - {None})
+            seen = set()
+            for data, errors in zip(validated, self.errors):
+                if data.get('id') not in existing:
+                    errors['id'] = [_('Recipe does not exist.')]
+                elif data['id'] in seen:
+                    errors['id'] = [_('Recipe is listed more than once.')]
+                seen.add(data.get('id'))
+
+        return validated
+
+    @property
+    def is_valid(self):
+        return not any(self.errors)
+
+    def _insert(self, recipes):
+        """Insert the recipes, setting their primary keys"""
+        connection = connections[Recipe.objects.db]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+            return
+        for recipe in recipes: #backends that can't return the new ids
+            recipe.save(force_insert=True)
+
+    def _link(self, validated, recipe_ids, replace=False):
+        """Link the recipes to the tags and ingredients of their items,
+        replace drops the existing links of the relations given"""
+        for field, model, column in RELATIONS:
+            through = getattr(Recipe, field).through
+            pairs = [
+                (recipe_id, data[field])
+                for recipe_id, data in zip(recipe_ids, validated)
+                if field in data
+            ]
+            if replace:
+                through.objects.filter(
+                    recipe_id__in=[recipe_id for recipe_id, _ids in pairs]
+                ).delete()
+            through.objects.bulk_create((
+                through(recipe_id=recipe_id, **{column: pk})
+                for recipe_id, ids in pairs
+                for pk in set(ids)
+            ), batch_size=self.batch_size)
+
+    def _written(self, recipe_ids):
+        """Do the work the per object signals would have done"""
+        Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
+        caching.bump_version(self.user.pk)
+
+    def create(self, validated):
+        """Create recipes from validated items, returns their ids"""
+        recipes = [
+            Recipe(user=self.user, **{
+                key: value for key, value in data.items()
+                if key not in ('id', 'tags', 'ingredients')
+            })
+            for data in validated
+        ]
+        with transaction.atomic():
+            self._insert(recipes)
+            recipe_ids = [recipe.pk for recipe in recipes]
+            self._link(validated, recipe_ids)
+            self._written(recipe_ids)
+
+        return recipe_ids
+
+    def update(self, validated):
+        """Apply validated partial updates, returns the recipe ids"""
+        recipe_ids = [data['id'] for data in validated]
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        fields = {'updated_at'}
+        now = timezone.now()
+        for data in validated:
+            recipe = recipes[data['id']]
+            recipe.updated_at = now
+            for key, value in data.items():
+                if key not in ('id', 'tags', 'ingredients'):
+                    setattr(recipe, key, value)
+                    fields.add(key)
+
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                recipes.values(), sorted(fields), batch_size=self.batch_size
+            )
+            self._link(validated, recipe_ids, replace=True)
+            self._written(recipe_ids)
+
+        return recipe_ids
+
+    def delete(self, recipe_ids):
+        """Delete the user's recipes with the ids, returns the count"""
+        with transaction.atomic():
+            count, _by_model = Recipe.objects.filter(
+                user=self.user, id__in=recipe_ids
+            ).delete()
+        caching.bump_version(self.user.pk)
+
+        return count
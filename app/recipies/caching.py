@@ -0,0 +1,170 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+
+def enabled():
+    """Whether responses are cached, API_CACHE_TIMEOUT=0 turns it off"""
+    return bool(settings.API_CACHE_TIMEOUT)
+
+
+def _version_timeout():
+    """An in process cache doesn't see the versions other processes bump,
+    there a version is only trusted as long as the responses it caches"""
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return settings.API_CACHE_TIMEOUT
+
+    return None
+
+
+def _version_key(user_id):
+    return f'api:version:{user_id}'
+
+
+def _modified_key(user_id):
+    return f'api:modified:{user_id}'
+
+
+def _new_version(user_id):
+    """Start a version counter, from the clock so an evicted counter is
+    never restarted at a version that still has cached responses"""
+    version = time.time_ns() // 1000
+    if cache.add(_version_key(user_id), version, _version_timeout()):
+        cache.set(_modified_key(user_id), time.time(), _version_timeout())
+
+    return cache.get(_version_key(user_id), version)
+
+
+def collection_version(user_id):
+    """Return the version of the user's recipes, tags and ingredients"""
+    return collection_state(user_id)[0]
+
+
+def collection_state(user_id):
+    """Return the version and last modification time of the user's data"""
+    keys = (_version_key(user_id), _modified_key(user_id))
+    state = cache.get_many(keys)
+    if keys[0] not in state:
+        return _new_version(user_id), time.time()
+
+    return state[keys[0]], state.get(keys[1], time.time())
+
+
+def bump_version(user_id):
+    """Invalidate every cached response of the user in O(1), once the
+    current transaction commits
+
+    Keys embed the version, so stale entries are never read again and
+    simply expire. Bumped before the commit, a concurrent request could
+    cache what it read of the old data under the new version.
+    """
+    transaction.on_commit(lambda: _bump_version(user_id))
+
+
+def _bump_version(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        _new_version(user_id)
+    else:
+        cache.set(_modified_key(user_id), time.time(), _version_timeout())
+
+
+def cache_key(user_id, version, host, path, query_params):
+    """Cache key of a GET by user, data version, host, path and params"""
+    params = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    )
+    digest = hashlib.md5(repr((host, path, params)).encode()).hexdigest()
+
+    return f'api:response:{user_id}:{version}:{digest}'
+
+
+def response_key(request, version=None):
+    """Cache key for a GET request by user, data version, path and params"""
+    if version is None:
+        version = collection_version(request.user.pk)
+
+    return cache_key(request.user.pk, version, request.get_host(),
+                     request.path, request.query_params)
+
+
+def response_etag(key):
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def last_modified(modified):
+    """The Last-Modified header for a modification time, None during the
+    second it happened in
+
+    Dates have whole seconds, a later write within the same second would
+    have the same date and If-Modified-Since would be answered with 304.
+    """
+    if int(modified) >= int(time.time()):
+        return None
+
+    return http_date(modified)
+
+
+def set_validators(response, etag, modified):
+    """Add the ETag, Last-Modified and Cache-Control of a cached response"""
+    response['ETag'] = etag
+    modified_date = last_modified(modified)
+    if modified_date is not None:
+        response['Last-Modified'] = modified_date
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+class CachedListMixin:
+    """Serve list responses from the per user cache
+
+    Responses carry an ETag and Last-Modified derived from the user's
+    data version, so conditional requests are answered with 304 before
+    any query runs.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def _cached(self, handler, request, *args, **kwargs):
+        """Return the cached data or run the handler and cache its data"""
+        if not enabled():
+            return handler(request, *args, **kwargs)
+        version, modified = collection_state(request.user.pk)
+        key = response_key(request, version)
+        etag = response_etag(key)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(modified)
+        )
+
+        if response is None:
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+
+        set_validators(response, etag, modified)
+
+        return response
+
+
+class CachedResponseMixin(CachedListMixin):
+    """Serve list and retrieve responses from the per user cache, for
+    viewsets with RetrieveModelMixin"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,82 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+#m2m field and the name of the related object in the through table
+EXPORT_RELATIONS = (('tags', 'tag__name'), ('ingredients', 'ingredient__name'))
+CSV_SEPARATOR = '|'
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def recipe_rows(queryset, chunk_size=1000):
+    """Yield recipes as dicts with their tag and ingredient names
+
+    Recipes are read through a server side cursor and the names are
+    loaded with one query per relation and chunk, so memory stays flat
+    however many recipes there are.
+    """
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    for chunk in _chunks(rows, chunk_size):
+        recipe_ids = [row['id'] for row in chunk]
+        names = {}
+        for field, name in EXPORT_RELATIONS:
+            through = getattr(Recipe, field).through
+            by_recipe = names[field] = {}
+            for recipe_id, value in through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).order_by(name).values_list('recipe_id', name):
+                by_recipe.setdefault(recipe_id, []).append(value)
+
+        for row in chunk:
+            for field, _name in EXPORT_RELATIONS:
+                row[field] = names[field].get(row['id'], [])
+            yield row
+
+
+def ndjson_lines(rows):
+    """Yield each row as a line of JSON"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """File like object handing back what the csv writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield a header and a CSV line per row, names joined by |"""
+    writer = csv.writer(_Echo())
+    columns = EXPORT_FIELDS + tuple(field for field, _ in EXPORT_RELATIONS)
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            CSV_SEPARATOR.join(row[column])
+            if isinstance(row[column], list) else row[column]
+            for column in columns
+        ])
+
+
+FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
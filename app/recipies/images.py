@@ -0,0 +1,131 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from PIL import Image
+
+from core.models import Recipe, recipe_image_path
+
+from recipies import caching, renditions
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+#longest side of the stored image in pixels, renditions are made from it
+IMAGE_MAX_SIZE = getattr(settings, 'IMAGE_MAX_SIZE', 2048)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """The process wide pool images are processed on, started lazily"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=IMAGE_WORKERS, thread_name_prefix='images'
+            )
+
+    return _executor
+
+
+def schedule(recipe):
+    """Process the recipe's image on the pool once the upload commits
+
+    Images are stored by content, if the upload is an image already
+    processed for another recipe it is used as is.
+    """
+    processed = Recipe.objects.filter(
+        image=recipe.image.name, image_status=Recipe.IMAGE_READY
+    ).exclude(pk=recipe.pk)
+    if processed.exists():
+        recipe.image_status = Recipe.IMAGE_READY
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_status=recipe.image_status
+        )
+        caching.bump_version(recipe.user_id)
+        return
+
+    transaction.on_commit(
+        lambda: executor().submit(_run, recipe.pk, recipe.image.name)
+    )
+
+
+def _run(recipe_id, name):
+    try:
+        process(recipe_id, name)
+    finally:
+        connection.close() #each worker thread has its own connection
+
+
+def mark_failed(recipe_id, name):
+    """Mark the recipe's image failed, unless it was replaced"""
+    uploaded = Recipe.objects.filter(pk=recipe_id, image=name)
+    user_id = uploaded.values_list('user_id', flat=True).first()
+    if user_id is not None and uploaded.update(
+            image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()):
+        caching.bump_version(user_id)
+
+
+def process(recipe_id, name):
+    """process_image, marking the image failed whatever goes wrong"""
+    try:
+        process_image(recipe_id, name)
+    except Exception:
+        logger.exception('Processing image %s of recipe %s failed',
+                         name, recipe_id)
+        mark_failed(recipe_id, name)
+
+
+def process_image(recipe_id, name):
+    """Replace the uploaded image with a stripped, resized JPEG and render
+    its renditions ahead of their first use
+
+    Nothing is changed if the recipe got another image in the meantime.
+    """
+    uploaded = Recipe.objects.filter(pk=recipe_id, image=name)
+    recipe = uploaded.first()
+    if recipe is None:
+        return
+    #updated_at tells how long it has been processing, see stale()
+    uploaded.update(
+        image_status=Recipe.IMAGE_PROCESSING, updated_at=timezone.now()
+    )
+    storage = recipe.image.storage
+
+    try:
+        with recipe.image.open('rb') as stream:
+            image = renditions.decode(stream, IMAGE_MAX_SIZE)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        mark_failed(recipe_id, name)
+        return
+
+    #saved without exif, the orientation has already been applied
+    stored = storage.save(
+        recipe_image_path(recipe, 'image.jpg'),
+        ContentFile(renditions.encode(image, IMAGE_MAX_SIZE, 'jpeg'))
+    )
+    renditions.render_all(stored, image)
+
+    #files may be shared with other recipes, unused ones are left to the
+    #gc_images command
+    if uploaded.update(image=stored, image_status=Recipe.IMAGE_READY,
+                       updated_at=timezone.now()):
+        caching.bump_version(recipe.user_id)
+
+
+def stale(older_than):
+    """Recipes whose image has been pending or processing for longer than
+    older_than seconds, their job was lost with a restarted process"""
+    return Recipe.objects.filter(
+        image_status__in=(Recipe.IMAGE_PENDING, Recipe.IMAGE_PROCESSING),
+        updated_at__lt=timezone.now() - timedelta(seconds=older_than),
+    ).exclude(image='')
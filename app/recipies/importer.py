@@ -0,0 +1,302 @@
+import codecs
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connections, transaction
+
+from core.models import Tag, Ingredient, Recipe, SEARCH_CONFIG
+
+from recipies import caching, typeahead
+from recipies.bulk import RELATIONS, RecipeBulkWriter
+from recipies.export import CSV_SEPARATOR
+
+
+class ImportRowError(ValueError):
+    """A row of an import file that can't be loaded"""
+
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+def _text(value, line, field, required=False):
+    if value is None:
+        value = ''
+    if not isinstance(value, str):
+        raise ImportRowError(line, f'{field} must be a string')
+    value = value.strip()
+    if required and not value:
+        raise ImportRowError(line, f'{field} is required')
+    if len(value) > 255:
+        raise ImportRowError(line, f'{field} is longer than 255 characters')
+
+    return value
+
+
+def _names(value, line, field):
+    if value is None:
+        value = []
+    elif isinstance(value, str):
+        value = value.split(CSV_SEPARATOR) if value else []
+    if not isinstance(value, list):
+        raise ImportRowError(line, f'{field} must be a list of names')
+    names = (_text(name, line, field) for name in value)
+
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def clean_row(row, line):
+    """Return the row checked and converted, as Recipe takes it
+
+    This is done by hand rather than with a serializer, which would be
+    the slowest part of importing a million rows.
+    """
+    if not isinstance(row, dict):
+        raise ImportRowError(line, 'expected an object')
+    try:
+        time_minutes = int(row.get('time_minutes'))
+    except (TypeError, ValueError):
+        raise ImportRowError(line, 'time_minutes must be an integer')
+    try:
+        price = Decimal(str(row.get('price')))
+    except InvalidOperation:
+        raise ImportRowError(line, 'price must be a number')
+    if not price.is_finite() or price.as_tuple().exponent < -2 \
+            or abs(price) >= 1000:
+        raise ImportRowError(line, 'price must be below 1000, in cents')
+
+    return {
+        'title': _text(row.get('title'), line, 'title', required=True),
+        'time_minutes': time_minutes,
+        'price': price,
+        'link': _text(row.get('link'), line, 'link'),
+        'tags': _names(row.get('tags'), line, 'tags'),
+        'ingredients': _names(row.get('ingredients'), line, 'ingredients'),
+    }
+
+
+def decode_lines(stream):
+    """Yield the lines of a binary UTF-8 stream as text, dropping a byte
+    order mark, raises ImportRowError on other encodings"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    line = 0
+    try:
+        for line, data in enumerate(stream, 1):
+            yield decoder.decode(data)
+        tail = decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise ImportRowError(line, 'the file must be UTF-8 encoded')
+    if tail:
+        yield tail
+
+
+def parse_rows(stream, file_format):
+    """Yield (line, row) from a binary NDJSON or CSV stream, one at a time
+
+    The stream is read line by line so files of any size can be parsed.
+    """
+    lines = decode_lines(stream)
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, clean_row(row, reader.line_num)
+        return
+
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            raise ImportRowError(line, 'invalid JSON')
+        yield line, clean_row(row, line)
+
+
+def import_format(name, default='ndjson'):
+    """Guess the format of a file from its name"""
+    return 'csv' if name.lower().endswith('.csv') else default
+
+
+class RecipeImporter:
+    """Load parsed rows into recipes of a user, upserting tags and
+    ingredients by name
+
+    On PostgreSQL the rows are copied into temporary staging tables with
+    COPY in batches and merged into the real tables with a handful of set
+    based statements. Other databases go through the bulk writer batch by
+    batch. Either way everything happens in one transaction.
+    """
+    batch_size = 10000
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        if batch_size:
+            self.batch_size = batch_size
+
+    def _batches(self, rows):
+        rows = iter(rows)
+        batch = list(islice(rows, self.batch_size))
+        while batch:
+            yield batch
+            batch = list(islice(rows, self.batch_size))
+
+    def load(self, rows):
+        """Import the (line, row) pairs, returns the number of recipes"""
+        connection = connections[Recipe.objects.db]
+        with transaction.atomic(using=connection.alias):
+            if connection.vendor == 'postgresql':
+                count = self._copy(connection, rows)
+            else:
+                count = sum(
+                    self._write_batch(batch) for batch in self._batches(rows)
+                )
+
+        #rows written with raw SQL and bulk_create send no signals
+        caching.bump_version(self.user.pk)
+        for model in (Tag, Ingredient):
+            typeahead.invalidate(model, self.user.pk)
+
+        return count
+
+    def _names_to_ids(self, model, names):
+        """Return {name: id} for the user, creating the missing names"""
+        def existing():
+            #descending so the oldest of any duplicate names wins
+            return dict(model.objects.filter(
+                user=self.user, name__in=names
+            ).order_by('-id').values_list('name', 'id'))
+
+        ids = existing()
+        missing = names - set(ids)
+        if missing:
+            model.objects.bulk_create(
+                model(user=self.user, name=name) for name in missing
+            )
+            ids = existing()
+
+        return ids
+
+    def _write_batch(self, batch):
+        items = [row for _line, row in batch]
+        for field, model, _column in RELATIONS:
+            ids = self._names_to_ids(
+                model, {name for item in items for name in item[field]}
+            )
+            for item in items:
+                item[field] = [ids[name] for name in item[field]]
+        RecipeBulkWriter(self.user).create(items)
+
+        return len(items)
+
+    def _copy(self, connection, rows):
+        """Stage the rows with COPY and merge them with set based SQL"""
+        quote = connection.ops.quote_name
+        count = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE import_recipe ('
+                ' line bigint PRIMARY KEY, id integer,'
+                ' title varchar(255) NOT NULL, time_minutes integer NOT NULL,'
+                ' price numeric(5, 2) NOT NULL, link varchar(255) NOT NULL'
+                ') ON COMMIT DROP'
+            )
+            cursor.execute(
+                'CREATE TEMPORARY TABLE import_link ('
+                ' line bigint NOT NULL, field varchar(16) NOT NULL,'
+                ' name varchar(255) NOT NULL'
+                ') ON COMMIT DROP'
+            )
+            for batch in self._batches(rows):
+                self._copy_batch(cursor, batch)
+                count += len(batch)
+            cursor.execute('ANALYZE import_recipe, import_link')
+
+            recipe_table = quote(Recipe._meta.db_table)
+            #take the ids up front so links can be joined on the line
+            cursor.execute(
+                'UPDATE import_recipe SET id = nextval('
+                'pg_get_serial_sequence(%s, %s))',
+                [Recipe._meta.db_table, 'id']
+            )
+            for field, model, _column in RELATIONS:
+                cursor.execute(
+                    f'INSERT INTO {quote(model._meta.db_table)} '
+                    '(user_id, name, updated_at) '
+                    'SELECT %s, new.name, now() FROM '
+                    '(SELECT DISTINCT name FROM import_link '
+                    ' WHERE field = %s) new '
+                    'WHERE NOT EXISTS (SELECT 1 FROM '
+                    f'{quote(model._meta.db_table)} old '
+                    'WHERE old.user_id = %s AND old.name = new.name)',
+                    [self.user.pk, field, self.user.pk]
+                )
+            #the search vector is built here from the staged names, as
+            #update_search_vector() would with a subquery per recipe
+            cursor.execute(
+                f'INSERT INTO {recipe_table} (id, user_id, title, '
+                'time_minutes, price, link, image_status, updated_at, '
+                'search_vector) '
+                'SELECT recipe.id, %s, title, time_minutes, price, link, '
+                "'', now(), "
+                "setweight(to_tsvector(%s::regconfig, title), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, "
+                "coalesce(tags.names, '')), 'B') || "
+                "setweight(to_tsvector(%s::regconfig, "
+                "coalesce(ingredients.names, '')), 'C') "
+                'FROM import_recipe recipe '
+                'LEFT JOIN (SELECT line, string_agg(name, %s) AS names '
+                ' FROM import_link WHERE field = %s GROUP BY line) tags '
+                ' ON tags.line = recipe.line '
+                'LEFT JOIN (SELECT line, string_agg(name, %s) AS names '
+                ' FROM import_link WHERE field = %s GROUP BY line) '
+                ' ingredients ON ingredients.line = recipe.line',
+                [self.user.pk] + [SEARCH_CONFIG] * 3 +
+                [' ', 'tags', ' ', 'ingredients']
+            )
+            for field, model, column in RELATIONS:
+                through = getattr(Recipe, field).through
+                cursor.execute(
+                    f'INSERT INTO {quote(through._meta.db_table)} '
+                    f'(recipe_id, {quote(column)}) '
+                    'SELECT recipe.id, named.id '
+                    'FROM import_link link '
+                    'JOIN import_recipe recipe ON recipe.line = link.line '
+                    'JOIN (SELECT name, min(id) AS id FROM '
+                    f'{quote(model._meta.db_table)} WHERE user_id = %s '
+                    'GROUP BY name) named ON named.name = link.name '
+                    'WHERE link.field = %s',
+                    [self.user.pk, field]
+                )
+            #the transaction may be nested, don't wait for the commit
+            cursor.execute('DROP TABLE import_recipe, import_link')
+
+        return count
+
+    def _copy_batch(self, cursor, batch):
+        recipes, links = io.StringIO(), io.StringIO()
+        recipe_writer, link_writer = csv.writer(recipes), csv.writer(links)
+        for line, row in batch:
+            recipe_writer.writerow((
+                line, row['title'], row['time_minutes'], row['price'],
+                row['link']
+            ))
+            for field, _model, _column in RELATIONS:
+                link_writer.writerows(
+                    (line, field, name) for name in row[field]
+                )
+
+        recipes.seek(0)
+        cursor.copy_expert(
+            'COPY import_recipe (line, title, time_minutes, price, link) '
+            'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (link))',
+            recipes
+        )
+        links.seek(0)
+        cursor.copy_expert(
+            'COPY import_link (line, field, name) FROM STDIN '
+            'WITH (FORMAT csv, FORCE_NOT_NULL (name))',
+            links
+        )
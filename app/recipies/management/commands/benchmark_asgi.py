@@ -0,0 +1,148 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+
+from recipies import caching
+from recipies.asgi import RecipeReadApp
+
+
+def p99(latencies):
+    return sorted(latencies)[int(len(latencies) * 0.99) - 1]
+
+
+class Command(BaseCommand):
+    """compares cached recipe reads through WSGI and the ASGI app"""
+    help = ('Benchmark requests/s and p99 latency of cached recipe list '
+            'and detail reads under WSGI and ASGI. The sample data is '
+            'committed, as both servers run requests on other threads, and '
+            'deleted afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if caching.enabled():
+            return self._benchmark(options)
+        #off by default with the local memory cache, which is fine for
+        #the one process benchmarked
+        with override_settings(API_CACHE_TIMEOUT=300):
+            return self._benchmark(options)
+
+    def _benchmark(self, options):
+        user = get_user_model().objects.create_user('benchmark@asgi.local')
+        try:
+            key = Token.objects.create(user=user).key
+            Recipe.objects.bulk_create(
+                Recipe(user=user, title=f'asgi recipe {number}',
+                       time_minutes=number % 60 + 1, price=number % 20 + 1)
+                for number in range(options['recipes'])
+            )
+            recipe = Recipe.objects.filter(user=user).first()
+            paths = [('list', reverse('recipies:recipe-list'))]
+            if recipe is not None:
+                paths.append(('detail', reverse(
+                    'recipies:recipe-detail', args=[recipe.pk]
+                )))
+
+            #a host django accepts, so both servers share cached responses
+            self.host = next((
+                host for host in settings.ALLOWED_HOSTS
+                if host != '*' and not host.startswith('.')
+            ), 'localhost')
+            #the user is new, so are its data version and token, nothing
+            #cached before is read and the shared caches are left alone
+            wsgi = get_wsgi_application()
+            asgi = RecipeReadApp(get_asgi_application())
+            self.stdout.write(
+                f'{"endpoint":<8} {"server":<6} {"req/s":>9} {"p99 ms":>8}'
+            )
+            for name, path in paths:
+                for server, run in (('wsgi', self._wsgi),
+                                    ('asgi', self._asgi)):
+                    app = wsgi if server == 'wsgi' else asgi
+                    run(app, path, key, 1, 1) #warms the caches
+                    start = time.perf_counter()
+                    latencies = run(
+                        app, path, key, options['requests'],
+                        options['concurrency']
+                    )
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f'{name:<8} {server:<6} '
+                        f'{len(latencies) / elapsed:>9.0f} '
+                        f'{p99(latencies) * 1000:>8.2f}'
+                    )
+        finally:
+            user.delete()
+
+    def _wsgi(self, app, path, key, count, concurrency):
+        """Latencies of count requests from concurrency threads"""
+        factory = RequestFactory(SERVER_NAME=self.host)
+
+        def request(_number):
+            environ = factory.get(
+                path, HTTP_AUTHORIZATION=f'Token {key}'
+            ).environ
+            start = time.perf_counter()
+            response = app(environ, lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(request, range(count)))
+
+    def _asgi(self, app, path, key, count, concurrency):
+        """Latencies of count requests, concurrency at a time"""
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', self.host.encode()),
+                (b'authorization', f'Token {key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            pass
+
+        async def request(slots):
+            async with slots:
+                start = time.perf_counter()
+                await app(dict(scope), receive, send)
+                return time.perf_counter() - start
+
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(request(slots) for _ in range(count))
+            )
+
+        return list(asyncio.run(run()))
@@ -0,0 +1,78 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Tag, Ingredient
+
+from recipies.bulk import RecipeBulkWriter
+from recipies.serializer import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """compares per recipe serializer saves with the bulk writer"""
+    help = ('Benchmark recipe import throughput one by one and with the '
+            'bulk writer. Sample data is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--links', type=int, default=5,
+                            help='tags and ingredients per recipe')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                'benchmark@bulk.local'
+            )
+            items = self._items(user, options['recipes'], options['links'])
+            self.stdout.write(f'{"path":<12} {"recipes/s":>12}')
+            self._time('one by one', len(items), lambda: [
+                self._save_one(user, item) for item in items
+            ])
+            self._time('bulk', len(items), lambda: self._save_bulk(
+                user, items
+            ))
+            transaction.set_rollback(True)
+
+    def _items(self, user, count, links):
+        """Return recipe payloads referencing random tags and ingredients"""
+        related = {}
+        for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+            model.objects.bulk_create(
+                model(user=user, name=f'{field} {i}') for i in range(50)
+            )
+            related[field] = list(
+                model.objects.filter(user=user).values_list('id', flat=True)
+            )
+
+        return [{
+            'title': f'recipe {i}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': random.sample(related['tags'], links),
+            'ingredients': random.sample(related['ingredients'], links),
+        } for i in range(count)]
+
+    def _save_one(self, user, item):
+        serializer = RecipeSerializer(
+            data=item, context={'request': SimpleNamespace(user=user)}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user)
+
+    def _save_bulk(self, user, items):
+        writer = RecipeBulkWriter(user)
+        validated = writer.validate(items)
+        assert writer.is_valid, writer.errors
+        writer.create(validated)
+
+    def _time(self, label, count, run):
+        """Print the recipes per second of the run"""
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:<12} {count / elapsed:>12.0f}')
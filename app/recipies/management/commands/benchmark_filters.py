@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, Tag
+
+
+FILTER_SIZES = (1, 5, 10, 25, 50)
+
+
+class Command(BaseCommand):
+    """times the recipe tag filters for growing numbers of tag ids"""
+    help = ('Benchmark match=any and match=all recipe filtering against the '
+            'old chained join. Sample data is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--tags-per-recipe', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = self._sample_data(
+                options['recipes'], options['tags_per_recipe']
+            )
+            self._run(user, options['repeat'])
+            transaction.set_rollback(True)
+
+    def _sample_data(self, recipe_count, tags_per_recipe):
+        """Create a user with recipes randomly tagged from 50 tags"""
+        user = get_user_model().objects.create_user(
+            'benchmark@filters.local'
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(max(FILTER_SIZES))
+        )
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        Recipe.objects.bulk_create((
+            Recipe(user=user, title=f'recipe {i}', time_minutes=1, price=1)
+            for i in range(recipe_count)
+        ), batch_size=500)
+        links = []
+        for recipe_id in Recipe.objects.filter(
+                user=user).values_list('id', flat=True):
+            for tag_id in random.sample(tag_ids, tags_per_recipe):
+                links.append(Recipe.tags.through(
+                    recipe_id=recipe_id, tag_id=tag_id
+                ))
+        Recipe.tags.through.objects.bulk_create(links, batch_size=500)
+
+        return user
+
+    def _time(self, queryset, repeat):
+        """Return the median milliseconds to fetch the ids of a queryset"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.values_list('id', flat=True))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
+
+    def _run(self, user, repeat):
+        """Print the timings for each number of filter ids"""
+        recipes = Recipe.objects.filter(user=user)
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        self.stdout.write(
+            f'{"ids":>4} {"join ms":>10} {"any ms":>10} {"all ms":>10}'
+        )
+        for size in FILTER_SIZES:
+            ids = tag_ids[:size]
+            timings = [self._time(queryset, repeat) for queryset in (
+                recipes.filter(tags__id__in=ids).distinct(),
+                recipes.linked_to('tags', ids),
+                recipes.linked_to('tags', ids, match_all=True),
+            )]
+            self.stdout.write(f'{size:>4} ' + ' '.join(
+                f'{timing:>10.2f}' for timing in timings
+            ))
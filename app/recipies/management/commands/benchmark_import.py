@@ -0,0 +1,61 @@
+import json
+import random
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe
+
+from recipies.importer import RecipeImporter, parse_rows
+
+
+class Command(BaseCommand):
+    """times importing a generated NDJSON file, reading and parsing
+    included"""
+    help = ('Benchmark the recipe import in recipes per minute. Sample data '
+            'is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--links', type=int, default=5,
+                            help='tags and ingredients per recipe')
+        parser.add_argument('--batch-size', type=int,
+                            default=RecipeImporter.batch_size)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                'benchmark@import.local'
+            )
+            with tempfile.TemporaryFile() as stream:
+                stream.writelines(
+                    self._lines(options['recipes'], options['links'])
+                )
+                stream.seek(0)
+                start = time.perf_counter()
+                RecipeImporter(user, options['batch_size']).load(
+                    parse_rows(stream, 'ndjson')
+                )
+                elapsed = time.perf_counter() - start
+            count = Recipe.objects.filter(user=user).count()
+            self.stdout.write(
+                f'{count} recipes in {elapsed:.2f}s, '
+                f'{count / elapsed * 60:.0f} recipes/min'
+            )
+            transaction.set_rollback(True)
+
+    def _lines(self, count, links):
+        """Yield encoded NDJSON lines naming random tags and ingredients"""
+        names = [f'name {i}' for i in range(100)]
+        for i in range(count):
+            yield json.dumps({
+                'title': f'recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': random.sample(names, links),
+                'ingredients': random.sample(names, links),
+            }).encode() + b'\n'
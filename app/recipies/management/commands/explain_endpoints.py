@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from rest_framework.request import Request
+
+from core.models import Ingredient, Tag
+from recipies import typeahead, views
+
+
+#label, viewset and query params of each list endpoint to explain
+ENDPOINTS = (
+    ('recipies', views.RecipeViewSet, {}),
+    ('recipies?tags', views.RecipeViewSet, {'tags': '1,2'}),
+    ('recipies?ingredients', views.RecipeViewSet, {'ingredients': '1,2'}),
+    ('tags', views.TagViewSet, {}),
+    ('tags?assigned_only', views.TagViewSet, {'assigned_only': 1}),
+    ('ingredients', views.IngredientViewSet, {}),
+    ('ingredients?assigned_only', views.IngredientViewSet,
+     {'assigned_only': 1}),
+)
+#label, model and partial name of each typeahead endpoint to explain
+TYPEAHEAD_ENDPOINTS = (
+    ('tags/typeahead', Tag, 'sal'),
+    ('ingredients/typeahead', Ingredient, 'sal'),
+)
+
+
+def endpoint_queryset(viewset, params, user):
+    """Return the first page queryset a list request would run"""
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    view = viewset(action='list', request=request, format_kwarg=None)
+    paginator = view.pagination_class()
+    ordering = paginator.ordering
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+
+    return view.get_queryset().order_by(*ordering)[:paginator.page_size]
+
+
+def typeahead_queryset(model, text, user):
+    """Return the queryset a typeahead request would run"""
+    return model.objects.filter(user=user).typeahead(
+        text, typeahead.TYPEAHEAD_LIMIT
+    )
+
+
+def is_sequential_scan(line):
+    """Check whether a postgres or sqlite plan line is a full table scan"""
+    if 'Seq Scan' in line:
+        return True
+    words = line.split()
+
+    return 'SCAN' in words and 'USING' not in words
+
+
+class Command(BaseCommand):
+    """runs EXPLAIN on the query behind each list endpoint"""
+    help = ('Print the query plan of each recipe API list endpoint and flag '
+            'sequential scans. Run ANALYZE first, planners prefer sequential '
+            'scans on small or unanalyzed tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='explain the queries as this user (default: first user)'
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help='exit with an error if any plan has a sequential scan'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        users = get_user_model().objects.order_by('id')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to explain the queries for')
+
+        querysets = [
+            (label, endpoint_queryset(viewset, params, user))
+            for label, viewset, params in ENDPOINTS
+        ] + [
+            (label, typeahead_queryset(model, text, user))
+            for label, model, text in TYPEAHEAD_ENDPOINTS
+        ]
+        flagged = []
+        for label, queryset in querysets:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for line in queryset.explain().splitlines():
+                if is_sequential_scan(line):
+                    flagged.append(label)
+                    self.stdout.write(self.style.WARNING(f'  {line}'))
+                else:
+                    self.stdout.write(f'  {line}')
+
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS('No sequential scans'))
+            return
+
+        message = 'Sequential scans in: ' + ', '.join(sorted(set(flagged)))
+        if options['fail_on_seq_scan']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
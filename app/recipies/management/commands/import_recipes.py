@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipies.importer import (
+    ImportRowError, RecipeImporter, import_format, parse_rows
+)
+
+
+class Command(BaseCommand):
+    """imports recipes for a user from an NDJSON or CSV file"""
+    help = ('Import recipes from an NDJSON or CSV file, as written by the '
+            'export endpoint. Tags and ingredients are matched by name.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--email', required=True,
+                            help='user the recipes are imported for')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='defaults to the file extension')
+        parser.add_argument('--batch-size', type=int,
+                            default=RecipeImporter.batch_size)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+        file_format = options['format'] or import_format(options['path'])
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                count = RecipeImporter(user, options['batch_size']).load(
+                    parse_rows(stream, file_format)
+                )
+        except (OSError, ImportRowError) as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {count} recipes'))
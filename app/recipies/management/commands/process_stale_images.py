@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipies import images
+
+
+class Command(BaseCommand):
+    """processes recipe images whose background job was lost"""
+    help = ('Process recipe images left pending or processing for longer '
+            'than --older-than seconds, as when the process handling them '
+            'restarted. With --expire they are marked failed instead.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=600)
+        parser.add_argument('--expire', action='store_true',
+                            help='mark the images failed, the users can '
+                                 'upload them again')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        stale = images.stale(options['older_than']).values_list(
+            'id', 'image'
+        )
+        count = 0
+        for recipe_id, name in stale.iterator():
+            if options['expire']:
+                images.mark_failed(recipe_id, name)
+            else:
+                images.process(recipe_id, name)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Expired" if options["expire"] else "Processed"} {count} '
+            f'stale images'
+        ))
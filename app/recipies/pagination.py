@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over the recipe primary key, newest first"""
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        """Order full text search results by rank"""
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', '-id')
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination for tags and ingredients in name order"""
+    ordering = ('-name', '-id')
@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from PIL import Image, ImageOps
+
+
+#longest side in pixels of each named rendition
+RENDITIONS = getattr(settings, 'IMAGE_RENDITIONS', {
+    'thumb': 200,
+    'medium': 800,
+    'large': 1600,
+})
+#Pillow format, content type and save options
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg',
+             {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+class RenditionCache:
+    """Files on disk, least recently used evicted once over max_bytes
+
+    Use is tracked through the access time, so every process sharing the
+    directory agrees on it. It is set explicitly, noatime mounts don't
+    matter, and the modification time stays the render's so the
+    Last-Modified it is served with doesn't change. The total size is
+    kept in process and only recounted from disk when evicting.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key, extension):
+        return os.path.join(self.root, key[:2], f'{key}.{extension}')
+
+    def touch(self, path):
+        """Mark the file used, returns False if it isn't cached"""
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def put(self, path, content):
+        """Write the file atomically and evict if the cache is too big"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as temp:
+            temp.write(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(stat.st_size for _path, stat in self._files())
+            else:
+                self._size += len(content)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith('.tmp'):
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError: #evicted by another process
+                        pass
+
+    def _evict(self):
+        """Remove the oldest files until 90% of max_bytes is left"""
+        files = sorted(self._files(), key=lambda file: file[1].st_atime)
+        size = sum(stat.st_size for _path, stat in files)
+        for path, stat in files:
+            if size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            for path, _stat in list(self._files()):
+                os.remove(path)
+            self._size = 0
+
+
+cache = RenditionCache(
+    getattr(settings, 'RENDITION_ROOT',
+            os.path.join(settings.MEDIA_ROOT, 'renditions')),
+    getattr(settings, 'RENDITION_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+)
+
+
+def decode(stream, size):
+    """Open an image upright and without metadata, as RGB"""
+    image = Image.open(stream)
+    #lets the JPEG decoder scale down while decoding
+    image.draft('RGB', (size, size))
+    image.load()
+
+    return ImageOps.exif_transpose(image).convert('RGB')
+
+
+def encode(image, size, file_format):
+    """Return the image shrunk to fit size, saved in the format"""
+    pillow_format, _content_type, options = FORMATS[file_format]
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=pillow_format, **options)
+
+    return buffer.getvalue()
+
+
+def rendition_path(name, rendition, file_format):
+    """Cache path of a rendition, named by a hash of the stored image
+    name and everything the output depends on"""
+    options = FORMATS[file_format][2]
+    key = hashlib.sha1(
+        repr((name, RENDITIONS[rendition], file_format, options)).encode()
+    ).hexdigest()
+
+    return cache.path(key, file_format)
+
+
+def render(name, rendition, file_format, storage=default_storage):
+    """Return the path of the rendition of the stored image, rendering it
+    on a miss"""
+    path = rendition_path(name, rendition, file_format)
+    if not cache.touch(path):
+        size = RENDITIONS[rendition]
+        with storage.open(name, 'rb') as stream:
+            image = decode(stream, size)
+        cache.put(path, encode(image, size, file_format))
+
+    return path
+
+
+def render_all(name, image):
+    """Write every rendition of a stored image from its decoded pixels"""
+    for rendition, size in RENDITIONS.items():
+        for file_format in FORMATS:
+            path = rendition_path(name, rendition, file_format)
+            if not cache.touch(path):
+                cache.put(path, encode(image, size, file_format))
+
+
+def urls(name, request=None):
+    """{rendition: {format: url}} of a stored image"""
+    def url(rendition, file_format):
+        location = reverse('recipies:rendition', kwargs={
+            'rendition': rendition, 'file_format': file_format, 'name': name
+        })
+        if request is None:
+            return location
+        return request.build_absolute_uri(location)
+
+    return {
+        rendition: {
+            file_format: url(rendition, file_format)
+            for file_format in FORMATS
+        }
+        for rendition in RENDITIONS
+    }
@@ -1,47 +1,145 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag, Ingredient, Recipe
 
+from recipies import renditions
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all submitted ids in one query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                pks.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        objects = child.get_queryset().in_bulk(set(pks))
+        missing = sorted({pk for pk in pks if pk not in objects})
+        if missing:
+            #every missing or foreign id in one error
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ], code='does_not_exist')
+
+        return [objects[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field only accepting objects of the requesting user"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return UserManyRelatedField(**list_kwargs)
+
+
+class RecipeAttrSerializer(serializers.ModelSerializer):
+    """Base serializer for user owned recipe attributes"""
+    recipe_count = serializers.SerializerMethodField()
+
+    def get_recipe_count(self, obj):
+        """Return the number of recipes using the object"""
+        if hasattr(obj, 'recipe_count'):
+            return obj.recipe_count #annotated by with_recipe_count()
+
+        return obj.recipe_set.count()
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(RecipeAttrSerializer):
     """Serialize - tag """
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_Fields = ('id',)
 
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(RecipeAttrSerializer):
     """Serializer -ingredients """
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_fields = ('id',)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Serialize recipies"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'title', 'ingredients', 'tags', 'time_minutes', 'price',
-            'link',
+            'link', 'image_status', 'images',
         )
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'image_status')
+
+    def get_images(self, recipe):
+        """Urls of the image renditions once the image is processed"""
+        if not recipe.image or \
+                recipe.image_status not in ('', Recipe.IMAGE_READY):
+            return None
+
+        return renditions.urls(recipe.image.name, self.context.get('request'))
 
  
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """Serialize one recipe of a bulk write, the related ids are checked
+    for all items at once by recipies.bulk"""
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'title', 'ingredients', 'tags', 'time_minutes', 'price',
+            'link',
+        )
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True) 
@@ -52,5 +150,14 @@ class RecipeImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)                     
\ No newline at end of file
+        fields = ('id', 'image', 'image_status')
+        read_only_fields = ('id', 'image_status')
+
+    def to_representation(self, recipe):
+        """The upload keeps its metadata until it is processed, so its url
+        is only given out after that"""
+        data = super().to_representation(recipe)
+        if recipe.image_status not in ('', Recipe.IMAGE_READY):
+            data['image'] = None
+
+        return data
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipies import caching, typeahead
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_changed(sender, instance, **kwargs):
+    """Drop the owner's cached typeahead results"""
+    typeahead.invalidate(sender, instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def user_data_changed(sender, instance, **kwargs):
+    """Invalidate the owner's cached API responses"""
+    caching.bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, **kwargs):
+    """Invalidate the owner's cached API responses"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_created(sender, instance, created, **kwargs):
+    """Start a new user from a fresh version, ids may be reused"""
+    if created:
+        caching.bump_version(instance.pk)
@@ -0,0 +1,271 @@
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipies import asgi
+from recipies.asgi import RecipeReadApp
+from user.authentication import token_cache
+
+
+RECIPES_URL = reverse('recipies:recipe-list')
+TAGS_URL = reverse('recipies:tag-list')
+
+
+def detail_url(recipe_id):
+    """returns the recipe detail URL"""
+    return reverse('recipies:recipe-detail', args=[recipe_id])
+
+
+class Fallback:
+    """ASGI app recording the requests passed on to it"""
+
+    def __init__(self):
+        self.paths = []
+
+    async def __call__(self, scope, receive, send):
+        self.paths.append(scope['path'])
+        await send({'type': 'http.response.start', 'status': 299,
+                    'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def call(app, path, method='GET', query=b'', **headers):
+    """Return the status, headers and body the app sends"""
+    host = headers.pop('host', 'testserver')
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'root_path': '',
+        'query_string': query,
+        'headers': [(b'host', host.encode())] + [
+            (name.replace('_', '-').encode(), value.encode())
+            for name, value in headers.items()
+        ],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(app)(scope, receive, send)
+    start, body = messages
+
+    return start['status'], dict(start['headers']), body['body']
+
+
+@override_settings(API_CACHE_TIMEOUT=300)
+class RecipeReadAppTests(TransactionTestCase):
+    """Test cached reads are answered without django"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'async@reads.com', 'eventloop'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='async stew', time_minutes=5, price=2.00
+        )
+        Tag.objects.create(user=self.user, name='fast')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.fallback = Fallback()
+        self.app = RecipeReadApp(self.fallback)
+        #caches the token, lookups off the test thread can't see its data
+        self.client.get(reverse('user:me'))
+
+    def test_cache_miss_falls_back(self):
+        """Test uncached requests go to django"""
+        cache.clear()
+
+        status, _headers, _body = call(
+            self.app, RECIPES_URL, authorization=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(status, 299)
+        self.assertEqual(self.fallback.paths, [RECIPES_URL])
+
+    def test_cached_responses_served(self):
+        """Test list and detail responses match the django ones"""
+        for path in (RECIPES_URL, TAGS_URL, detail_url(self.recipe.id)):
+            res = self.client.get(path, HTTP_ACCEPT='application/json')
+
+            with self.assertNumQueries(0):
+                status, headers, body = call(
+                    self.app, path, authorization=f'Token {self.token.key}'
+                )
+
+            self.assertEqual(status, 200)
+            self.assertEqual(body, res.content)
+            self.assertEqual(headers[b'etag'], res['ETag'].encode())
+            self.assertEqual(headers[b'content-type'], b'application/json')
+            self.assertEqual(headers[b'x-content-type-options'], b'nosniff')
+        self.assertEqual(self.fallback.paths, [])
+
+    def test_query_params_part_of_key(self):
+        """Test other params are not served the cached response"""
+        self.client.get(RECIPES_URL, {'search': 'stew'})
+
+        status, _headers, _body = call(
+            self.app, RECIPES_URL, query=b'search=pie',
+            authorization=f'Token {self.token.key}'
+        )
+        cached, _headers, _body = call(
+            self.app, RECIPES_URL, query=b'search=stew',
+            authorization=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(status, 299)
+        self.assertEqual(cached, 200)
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets a 304"""
+        res = self.client.get(RECIPES_URL)
+
+        status, headers, body = call(
+            self.app, RECIPES_URL, authorization=f'Token {self.token.key}',
+            if_none_match=res['ETag']
+        )
+
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(headers[b'etag'], res['ETag'].encode())
+
+    def test_invalidated_by_write(self):
+        """Test a write makes the next read go to django"""
+        self.client.get(RECIPES_URL)
+        self.client.post(TAGS_URL, {'name': 'new'})
+
+        status, _headers, _body = call(
+            self.app, RECIPES_URL, authorization=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(status, 299)
+
+    def test_head_has_no_body(self):
+        """Test HEAD requests get the headers only"""
+        self.client.get(RECIPES_URL)
+
+        status, headers, body = call(
+            self.app, RECIPES_URL, method='HEAD',
+            authorization=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'')
+        self.assertNotEqual(headers[b'content-length'], b'0')
+
+    def test_other_requests_fall_back(self):
+        """Test writes, the browsable api and unknown paths go to django"""
+        self.client.get(RECIPES_URL)
+        auth = f'Token {self.token.key}'
+
+        responses = [
+            call(self.app, RECIPES_URL, method='POST', authorization=auth),
+            call(self.app, RECIPES_URL, authorization=auth,
+                 accept='text/html,*/*;q=0.8'),
+            call(self.app, RECIPES_URL, query=b'format=api',
+                 authorization=auth),
+            call(self.app, RECIPES_URL),
+            call(self.app, reverse('user:me'), authorization=auth),
+        ]
+
+        self.assertEqual([res[0] for res in responses], [299] * 5)
+
+    def test_disallowed_host_falls_back(self):
+        """Test hosts django would refuse are left to django"""
+        self.client.get(RECIPES_URL)
+        status, _headers, _body = call(
+            self.app, RECIPES_URL, authorization=f'Token {self.token.key}',
+            host='evil.example.com'
+        )
+
+        self.assertEqual(status, 299)
+
+    def test_caching_off_falls_back(self):
+        """Test every request goes to django with API_CACHE_TIMEOUT=0"""
+        self.client.get(RECIPES_URL)
+        with override_settings(API_CACHE_TIMEOUT=0):
+            status, _headers, _body = call(
+                self.app, RECIPES_URL,
+                authorization=f'Token {self.token.key}'
+            )
+
+        self.assertEqual(status, 299)
+
+    def test_every_middleware_accounted_for(self):
+        """Test each middleware is run or known to have nothing to do
+
+        A middleware added to MIDDLEWARE must be added to
+        APPLIED_MIDDLEWARE or SKIPPED_MIDDLEWARE of recipies.asgi.
+        """
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(
+                path in asgi.APPLIED_MIDDLEWARE or
+                path in asgi.SKIPPED_MIDDLEWARE,
+                f'{path} is neither run nor skipped by recipies.asgi'
+            )
+
+    def test_unknown_middleware_falls_back(self):
+        """Test every request goes to django with an unknown middleware"""
+        self.client.get(RECIPES_URL)
+
+        with self.settings(MIDDLEWARE=settings.MIDDLEWARE + [
+                'django.middleware.locale.LocaleMiddleware']), \
+                self.assertLogs('recipies.asgi', 'WARNING'):
+            status, _headers, _body = call(
+                RecipeReadApp(self.fallback), RECIPES_URL,
+                authorization=f'Token {self.token.key}'
+            )
+
+        self.assertEqual(status, 299)
+
+
+@override_settings(API_CACHE_TIMEOUT=300)
+class RecipeReadAppTokenTests(TransactionTestCase):
+    """Test tokens missing from the cache are looked up off the loop"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'async@tokens.com', 'eventloop'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.app = RecipeReadApp(Fallback())
+
+    def test_token_looked_up(self):
+        """Test an uncached token is checked against the database"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(TAGS_URL)
+        token_cache.clear()
+
+        status, _headers, _body = call(
+            self.app, TAGS_URL, authorization=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(status, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    def test_unknown_token_falls_back(self):
+        """Test an invalid token is left to django to reject"""
+        status, _headers, _body = call(
+            self.app, TAGS_URL, authorization='Token nosuchtoken'
+        )
+
+        self.assertEqual(status, 299)
@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from user.authentication import token_cache
+
+
+class BenchmarkFiltersCommandTests(TestCase):
+    """Test the recipe filter benchmark command"""
+
+    def test_benchmark_rolls_back_sample_data(self):
+        """Test timings are printed and the sample data is discarded"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_filters', recipes=10, repeat=1, stdout=out
+        )
+
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchmarkAsgiCommandTests(TransactionTestCase):
+    """Test the WSGI and ASGI read benchmark command"""
+
+    def test_benchmark_deletes_sample_data(self):
+        """Test both servers are timed and the sample data is deleted"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_asgi', requests=20, concurrency=4, recipes=3,
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual([line.split()[1] for line in lines[1:]],
+                         ['wsgi', 'asgi', 'wsgi', 'asgi'])
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_leaves_shared_caches(self):
+        """Test entries the benchmark didn't make are kept"""
+        cache.set('benchmark:unrelated', 1)
+        token_cache.set('unrelated', 2)
+        self.addCleanup(cache.delete, 'benchmark:unrelated')
+        self.addCleanup(token_cache.delete, 'unrelated')
+
+        call_command(
+            'benchmark_asgi', requests=2, concurrency=1, recipes=1,
+            stdout=StringIO()
+        )
+
+        self.assertEqual(cache.get('benchmark:unrelated'), 1)
+        self.assertEqual(token_cache.get('unrelated'), 2)
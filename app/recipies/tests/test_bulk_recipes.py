@@ -0,0 +1,169 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+BULK_URL = reverse('recipies:recipe-bulk')
+RECIPES_URL = reverse('recipies:recipe-list')
+
+
+def recipe_payload(**params):
+    """Return a valid recipe payload"""
+    payload = {'title': 'bulk biriyani', 'time_minutes': 45, 'price': 9.50}
+    payload.update(params)
+
+    return payload
+
+
+class BulkRecipeApiTests(TransactionTestCase):
+    """Test writing many recipes in one request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@import.com',
+            'nightly'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='rice')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='basmati'
+        )
+
+    def test_bulk_create(self):
+        """Test creating recipes with their tags and ingredients"""
+        payload = [
+            recipe_payload(
+                title=f'recipe {i}',
+                tags=[self.tag.id],
+                ingredients=[self.ingredient.id]
+            )
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['ids']), 3)
+        for recipe in Recipe.objects.filter(id__in=res.data['ids']):
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(
+                list(recipe.ingredients.all()), [self.ingredient]
+            )
+
+    def test_bulk_create_resolves_ids_in_one_query_per_type(self):
+        """Test the query count does not grow with the related ids"""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+            for i in range(20)
+        ]
+
+        def count_queries(tag_ids):
+            payload = [recipe_payload(tags=tag_ids) for _ in range(2)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(BULK_URL, payload, format='json')
+            return len(ctx.captured_queries)
+
+        self.assertEqual(
+            count_queries([tags[0].id]),
+            count_queries([tag.id for tag in tags])
+        )
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test invalid items are reported and nothing is written"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        foreign_tag = Tag.objects.create(user=user2, name='foreign')
+        payload = [
+            recipe_payload(),
+            recipe_payload(title=''),
+            recipe_payload(tags=[foreign_tag.id]),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('title', errors[1])
+        self.assertIn('tags', errors[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        """Test partially updating recipes and replacing their tags"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='old', time_minutes=1, price=1.00
+        )
+        recipe.ingredients.add(self.ingredient)
+        payload = [{'id': recipe.id, 'title': 'new', 'tags': [self.tag.id]}]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'new')
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_update_other_users_recipe_rejected(self):
+        """Test recipes of other users cannot be updated"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user2, title='theirs', time_minutes=1, price=1.00
+        )
+
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'mine'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data['errors'][0])
+
+    def test_bulk_delete(self):
+        """Test deleting only the user's recipes"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        mine = Recipe.objects.create(
+            user=self.user, title='mine', time_minutes=1, price=1.00
+        )
+        theirs = Recipe.objects.create(
+            user=user2, title='theirs', time_minutes=1, price=1.00
+        )
+
+        res = self.client.delete(
+            BULK_URL, [mine.id, theirs.id], format='json'
+        )
+
+        self.assertEqual(res.data['deleted'], 1)
+        self.assertFalse(Recipe.objects.filter(id=mine.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=theirs.id).exists())
+
+    def test_bulk_create_visible_in_cached_list(self):
+        """Test bulk writes invalidate cached list responses"""
+        self.client.get(RECIPES_URL)
+        self.client.post(BULK_URL, [recipe_payload()], format='json')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class BenchmarkBulkRecipesCommandTests(TestCase):
+    """Test the bulk recipe benchmark command"""
+
+    def test_benchmark_rolls_back_sample_data(self):
+        """Test both paths are timed and the sample data is discarded"""
+        out = StringIO()
+
+        call_command('benchmark_bulk_recipes', recipes=5, stdout=out)
+
+        self.assertIn('bulk', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
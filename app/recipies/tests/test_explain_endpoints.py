@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipies.management.commands import explain_endpoints
+
+
+class ExplainEndpointsCommandTests(TestCase):
+    """Test the command explaining the list endpoint queries"""
+
+    def test_explains_every_endpoint(self):
+        """Test a plan is printed for each list endpoint"""
+        get_user_model().objects.create_user('plan@explain.com', 'analyze')
+        out = StringIO()
+
+        call_command('explain_endpoints', stdout=out)
+
+        for label, viewset, params in explain_endpoints.ENDPOINTS:
+            self.assertIn(label, out.getvalue())
+        for label, model, text in explain_endpoints.TYPEAHEAD_ENDPOINTS:
+            self.assertIn(label, out.getvalue())
+
+    def test_requires_user(self):
+        """Test the command fails when there is no user"""
+        with self.assertRaises(CommandError):
+            call_command('explain_endpoints', stdout=StringIO())
+
+    def test_sequential_scan_detection(self):
+        """Test postgres and sqlite full scans are recognised"""
+        self.assertTrue(explain_endpoints.is_sequential_scan(
+            'Seq Scan on core_tag  (cost=0.00..1.01 rows=1 width=8)'
+        ))
+        self.assertTrue(explain_endpoints.is_sequential_scan(
+            '2 0 0 SCAN TABLE core_tag'
+        ))
+        self.assertFalse(explain_endpoints.is_sequential_scan(
+            '4 0 0 SEARCH TABLE core_tag USING INDEX core_tag_user_name_idx'
+        ))
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipies import export
+
+
+EXPORT_URL = reverse('recipies:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe book"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'export@book.com',
+            'streamed'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='sambar', time_minutes=30, price=4.50
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='veg'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='dal'),
+            Ingredient.objects.create(user=self.user, name='tamarind'),
+        )
+
+    def test_export_ndjson(self):
+        """Test recipes are streamed as one JSON object per line"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        Recipe.objects.create(
+            user=user2, title='theirs', time_minutes=1, price=1.00
+        )
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['title'], 'sambar')
+        self.assertEqual(row['tags'], ['veg'])
+        self.assertEqual(row['ingredients'], ['dal', 'tamarind'])
+
+    def test_export_csv(self):
+        """Test recipes are streamed as CSV with joined names"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        content = b''.join(res.streaming_content).decode()
+        header, row = list(csv.reader(content.splitlines()))
+        self.assertEqual(header[-2:], ['tags', 'ingredients'])
+        self.assertEqual(row[1], 'sambar')
+        self.assertEqual(row[-1], 'dal|tamarind')
+
+    def test_export_invalid_format(self):
+        """Test unknown export formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rows_loaded_per_chunk(self):
+        """Test names are queried per chunk, not per recipe"""
+        for i in range(4):
+            Recipe.objects.create(
+                user=self.user, title=f'recipe {i}', time_minutes=1, price=1
+            )
+        rows = export.recipe_rows(
+            Recipe.objects.filter(user=self.user), chunk_size=2
+        )
+
+        with self.assertNumQueries(1 + 3 * 2):
+            self.assertEqual(len(list(rows)), 5)
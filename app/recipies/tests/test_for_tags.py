@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -26,7 +26,7 @@ class PublicTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTests(TestCase):
+class PrivateTagsApiTests(TransactionTestCase):
     """Test the authorized user tags API"""
 
     def setUp(self):
@@ -47,7 +47,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)#creates serializer for all tag objectts
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_for_particular_user(self):
         """Test that tags returned are for authenticated user"""
@@ -61,8 +61,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
 
     def test_fetching_tag_assigned_to_recipes(self):
@@ -82,8 +82,8 @@ class PrivateTagsApiTests(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
 
     def test_fetching_tags_assigned_unique(self):
@@ -107,4 +107,24 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_include_recipe_count(self):
+        """Test each tag reports how many recipes use it"""
+        tag1 = Tag.objects.create(user=self.user, name='spicy')
+        tag2 = Tag.objects.create(user=self.user, name='mild')
+        for title in ('vindaloo', 'phaal'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=30,
+                price=8.00,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL)
+
+        counts = {
+            tag['id']: tag['recipe_count'] for tag in res.data['results']
+        }
+        self.assertEqual(counts, {tag1.id: 2, tag2.id: 0})
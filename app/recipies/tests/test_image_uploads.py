@@ -0,0 +1,177 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.test import APIClient
+
+from PIL import Image
+
+from core.models import Recipe
+
+from recipies import uploads
+
+
+def start_url(recipe_id):
+    return reverse('recipies:recipe-start-image-upload', args=[recipe_id])
+
+
+def upload_url(recipe_id, upload_id):
+    return reverse(
+        'recipies:recipe-image-upload', args=[recipe_id, upload_id]
+    )
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), 'green').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ResumableImageUploadTests(TestCase):
+    """Test uploading recipe images in chunks"""
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        settings = override_settings(MEDIA_ROOT=temp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = patch.object(uploads, 'UPLOAD_DIR', temp.name + '/parts')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'chunks@book.com',
+            'resumed'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='halwa', time_minutes=60, price=5
+        )
+
+    def start(self, size):
+        return self.client.post(start_url(self.recipe.id), {'size': size})
+
+    def send(self, upload_id, offset, chunk):
+        return self.client.patch(
+            upload_url(self.recipe.id, upload_id), chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_upload_in_chunks(self):
+        """Test chunks are collected and attached once complete"""
+        content = png_bytes()
+        upload_id = self.start(len(content)).data['id']
+
+        res = self.send(upload_id, 0, content[:20])
+
+        self.assertEqual(res.data['offset'], 20)
+        self.assertEqual(res['Upload-Offset'], '20')
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+        self.assertEqual(res.data['offset'], 20)
+
+        res = self.send(upload_id, 20, content[20:])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['offset'], len(content))
+        self.assertEqual(res.data['recipe']['image_status'], 'pending')
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.png'))
+        with self.recipe.image.open('rb') as image:
+            self.assertEqual(image.read(), content)
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_wrong_offset_conflicts(self):
+        """Test a chunk for another offset is rejected with the offset"""
+        content = png_bytes()
+        upload_id = self.start(len(content)).data['id']
+        self.send(upload_id, 0, content[:20])
+
+        res = self.send(upload_id, 0, content[:20])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], '20')
+
+    def test_declared_size_limited(self):
+        """Test uploads over the limit are refused before any byte"""
+        res = self.start(uploads.MAX_BYTES + 1)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_chunk_past_declared_size(self):
+        """Test more bytes than declared are refused"""
+        upload_id = self.start(10).data['id']
+
+        res = self.send(upload_id, 0, b'\x89PNG\r\n\x1a\n' + b'0' * 10)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_format_sniffed_from_first_bytes(self):
+        """Test a non image is refused after its first chunk"""
+        upload_id = self.start(1000).data['id']
+
+        res = self.send(upload_id, 0, b'%PDF-1.4 not an image')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_corrupt_image_not_attached(self):
+        """Test a complete upload that isn't a valid image is refused"""
+        content = b'\xff\xd8\xff' + b'garbage' * 10
+        upload_id = self.start(len(content)).data['id']
+
+        res = self.send(upload_id, 0, content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_finished_once(self):
+        """Test an empty last chunk after the upload finished is refused"""
+        content = png_bytes()
+        upload_id = self.start(len(content)).data['id']
+        first = uploads.ImageUpload.get(self.recipe, upload_id)
+        second = uploads.ImageUpload.get(self.recipe, upload_id)
+        first.append(0, io.BytesIO(content), len(content), self.recipe)
+
+        with self.assertRaises(NotFound):
+            second.append(len(content), io.BytesIO(), 0, self.recipe)
+
+    def test_moved_part_not_written(self):
+        """Test a part moved away while waiting for the lock is detected"""
+        upload_id = self.start(100).data['id']
+        upload = uploads.ImageUpload.get(self.recipe, upload_id)
+
+        with open(upload.path, 'r+b') as part:
+            self.assertTrue(upload._is_current(part))
+            os.rename(upload.path, upload.path + '.moved')
+
+            self.assertFalse(upload._is_current(part))
+
+    def test_other_users_upload_not_found(self):
+        """Test uploads are only reachable through their recipe"""
+        upload_id = self.start(100).data['id']
+        other = Recipe.objects.create(
+            user=self.user, title='other', time_minutes=1, price=1
+        )
+
+        res = self.client.get(upload_url(other.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
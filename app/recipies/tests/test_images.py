@@ -0,0 +1,185 @@
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from PIL import Image
+
+from core.models import Recipe
+
+from recipies import images, renditions
+
+
+def jpeg(size=(3000, 1000), exif=None):
+    buffer = io.BytesIO()
+    kwargs = {'exif': exif} if exif else {}
+    Image.new('RGB', size, 'red').save(buffer, format='JPEG', **kwargs)
+
+    return ContentFile(buffer.getvalue())
+
+
+class ImageProcessingTests(TestCase):
+    """Test processing uploaded recipe images"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'images@book.com',
+            'pictured'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='payasam', time_minutes=40, price=3
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = patch.object(renditions, 'cache', renditions.RenditionCache(
+            os.path.join(media.name, 'renditions'), 10 * 1024 * 1024
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, content):
+        self.recipe.image.save('upload.jpg', content)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+        return self.recipe.image.name
+
+    def test_process_image_resizes_and_renders(self):
+        """Test the upload is replaced by a resized JPEG and renditions"""
+        name = self.upload(jpeg())
+
+        images.process_image(self.recipe.pk, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertNotEqual(self.recipe.image.name, name)
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(max(image.size), images.IMAGE_MAX_SIZE)
+        for rendition, size in renditions.RENDITIONS.items():
+            for file_format in renditions.FORMATS:
+                path = renditions.rendition_path(
+                    self.recipe.image.name, rendition, file_format
+                )
+                with Image.open(path) as image:
+                    self.assertEqual(max(image.size), size)
+
+    def test_process_image_strips_exif(self):
+        """Test exif is dropped after applying its orientation"""
+        exif = Image.Exif()
+        exif[0x0112] = 6 #rotated 90 degrees
+        exif[0x010f] = 'PhoneMaker'
+        name = self.upload(jpeg(size=(400, 100), exif=exif))
+
+        images.process_image(self.recipe.pk, name)
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (100, 400))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_process_image_failure(self):
+        """Test an undecodable upload is marked failed"""
+        name = self.upload(ContentFile(b'not really a jpeg'))
+
+        images.process_image(self.recipe.pk, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_any_processing_error_marks_failed(self):
+        """Test an error storing the processed image marks it failed"""
+        name = self.upload(jpeg(size=(10, 10)))
+
+        with patch.object(renditions, 'encode', side_effect=RuntimeError):
+            images.process(self.recipe.pk, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_stale_images_processed(self):
+        """Test images left pending by a lost job are processed"""
+        name = self.upload(jpeg(size=(10, 10)))
+        out = io.StringIO()
+
+        call_command('process_stale_images', older_than=60, stdout=out)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+        call_command('process_stale_images', older_than=60, stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertNotEqual(self.recipe.image.name, name)
+        self.assertIn('Processed 1 stale images', out.getvalue())
+
+    def test_stale_images_expired(self):
+        """Test stale images can be marked failed instead"""
+        self.upload(jpeg(size=(10, 10)))
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.IMAGE_PROCESSING,
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        call_command(
+            'process_stale_images', expire=True, stdout=io.StringIO()
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_process_replaced_image_is_skipped(self):
+        """Test an image replaced before processing is left alone"""
+        name = self.upload(jpeg(size=(10, 10)))
+        self.upload(jpeg(size=(12, 12)))
+
+        images.process_image(self.recipe.pk, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+
+    def test_schedule_submits_after_commit(self):
+        """Test processing is queued on the pool when the upload commits"""
+        self.upload(jpeg(size=(10, 10)))
+        with patch('recipies.images.executor') as executor, \
+                patch('recipies.images.transaction.on_commit',
+                      side_effect=lambda callback: callback()):
+            images.schedule(self.recipe)
+
+        executor().submit.assert_called_once_with(
+            images._run, self.recipe.pk, self.recipe.image.name
+        )
+
+    def test_duplicate_of_processed_image_not_processed_again(self):
+        """Test an upload identical to a processed image is ready at once"""
+        name = self.upload(jpeg(size=(10, 10)))
+        images.process_image(self.recipe.pk, name)
+        self.recipe.refresh_from_db()
+        other = Recipe.objects.create(
+            user=self.user, title='kheer', time_minutes=40, price=3
+        )
+        with self.recipe.image.open('rb') as stream:
+            other.image.save('copy.jpg', ContentFile(stream.read()))
+
+        with patch('recipies.images.executor') as executor, \
+                patch('recipies.images.transaction.on_commit',
+                      side_effect=lambda callback: callback()):
+            images.schedule(other)
+
+        executor.assert_not_called()
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_status, Recipe.IMAGE_READY)
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+IMPORT_URL = reverse('recipies:recipe-import-recipes')
+EXPORT_URL = reverse('recipies:recipe-export')
+
+
+def ndjson_file(*rows, name='recipes.ndjson'):
+    content = ''.join(json.dumps(row) + '\n' for row in rows)
+    return SimpleUploadedFile(name, content.encode())
+
+
+class RecipeImportApiTests(TestCase):
+    """Test importing recipes from uploaded files"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'import@book.com',
+            'loaded'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_import_ndjson(self):
+        """Test recipes are created and tags upserted by name"""
+        veg = Tag.objects.create(user=self.user, name='veg')
+        other = get_user_model().objects.create_user('other@a.com', 'pass')
+        Ingredient.objects.create(user=other, name='dal')
+
+        res = self.client.post(IMPORT_URL, {'file': ndjson_file(
+            {'title': 'sambar', 'time_minutes': 30, 'price': '4.50',
+             'tags': ['veg'], 'ingredients': ['dal', 'tamarind']},
+            {'title': 'rasam', 'time_minutes': 15, 'price': 2,
+             'tags': ['veg', 'soup'], 'ingredients': ['tamarind']},
+        )})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['count'], 2)
+        sambar = Recipe.objects.get(user=self.user, title='sambar')
+        self.assertEqual(list(sambar.tags.all()), [veg])
+        self.assertCountEqual(
+            sambar.ingredients.values_list('name', flat=True),
+            ['dal', 'tamarind']
+        )
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_invalid_row_writes_nothing(self):
+        """Test a bad row is reported by line and nothing is imported"""
+        res = self.client.post(IMPORT_URL, {'file': ndjson_file(
+            {'title': 'fine', 'time_minutes': 1, 'price': 1, 'tags': ['a']},
+            {'title': 'bad', 'time_minutes': 'soon', 'price': 1},
+        )})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('line 2', res.data['file'][0])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_import_csv_with_byte_order_mark(self):
+        """Test a UTF-8 byte order mark isn't read into the first header"""
+        upload = SimpleUploadedFile(
+            'recipes.csv',
+            'title,time_minutes,price\ncrêpe,5,2\n'.encode('utf-8-sig')
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.get(user=self.user).title, 'crêpe')
+
+    def test_import_not_utf8_rejected(self):
+        """Test a file in another encoding is reported by line"""
+        upload = SimpleUploadedFile(
+            'recipes.csv',
+            'title,time_minutes,price\ncrêpe,5,2\n'.encode('latin-1')
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('line 2', res.data['file'][0])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_export_csv_round_trip(self):
+        """Test an exported CSV imports back as the same recipes"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='dosa', time_minutes=20, price='3.00'
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='breakfast'))
+        content = b''.join(self.client.get(
+            EXPORT_URL, {'export_format': 'csv'}
+        ).streaming_content)
+
+        res = self.client.post(IMPORT_URL, {
+            'file': SimpleUploadedFile('recipes.csv', content)
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(user=self.user, title='dosa')
+        self.assertEqual(recipes.count(), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        for imported in recipes:
+            self.assertEqual(
+                list(imported.tags.values_list('name', flat=True)),
+                ['breakfast']
+            )
+
+    def test_imported_recipes_searchable(self):
+        """Test imported recipes can be searched by tag name"""
+        self.client.post(IMPORT_URL, {'file': ndjson_file(
+            {'title': 'idli', 'time_minutes': 5, 'price': 1,
+             'tags': ['steamed']},
+        )})
+
+        res = self.client.get(
+            reverse('recipies:recipe-list'), {'search': 'steamed'}
+        )
+
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes and benchmark_import commands"""
+
+    def test_import_from_file(self):
+        """Test the command imports a file for the given user"""
+        user = get_user_model().objects.create_user('cmd@book.com', 'pass')
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            f.write('title,time_minutes,price,ingredients\n')
+            f.write('upma,10,1.25,rava|ghee\n')
+        out = StringIO()
+
+        call_command('import_recipes', path, email=user.email, stdout=out)
+
+        self.assertIn('Imported 1 recipes', out.getvalue())
+        recipe = Recipe.objects.get(user=user)
+        self.assertEqual(recipe.ingredients.count(), 2)
+
+    def test_import_not_utf8_fails_cleanly(self):
+        """Test a file in another encoding fails with a command error"""
+        user = get_user_model().objects.create_user('cmd@book.com', 'pass')
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write('{"title": "crêpe"}\n'.encode('latin-1'))
+
+        with self.assertRaisesMessage(CommandError, 'line 1'):
+            call_command('import_recipes', path, email=user.email)
+
+    def test_benchmark_rolls_back_sample_data(self):
+        """Test the throughput is printed and the sample data discarded"""
+        out = StringIO()
+
+        call_command('benchmark_import', recipes=20, stdout=out)
+
+        self.assertIn('recipes/min', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -26,7 +26,7 @@ class PublicIngredientsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientsAPITests(TestCase):
+class PrivateIngredientsAPITests(TransactionTestCase):
     """Test ingredients can be retrieved by authorized user"""
 
     def setUp(self):
@@ -47,7 +47,7 @@ class PrivateIngredientsAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test that only ingredients for authenticated user are returned"""
@@ -62,8 +62,8 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
 
     def test_create_ingredient_successful(self):
@@ -108,8 +108,8 @@ class PrivateIngredientsAPITests(TestCase):
 
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     
     def test_fetching_ingredient_assigned_unique(self):
@@ -133,4 +133,22 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)    
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)    
+
+    def test_assigned_ingredients_include_recipe_count(self):
+        """Test assigned ingredients report their recipe count"""
+        ingredient = Ingredient.objects.create(user=self.user, name='garlic')
+        Ingredient.objects.create(user=self.user, name='saffron')
+        for title in ('aioli', 'garlic bread', 'pesto'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=10,
+                price=3.00,
+                user=self.user
+            )
+            recipe.ingredients.add(ingredient)
+
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['recipe_count'], 3)
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TransactionTestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipies.pagination import RecipeCursorPagination
+
+
+RECIPES_URL = reverse('recipies:recipe-list')
+TAGS_URL = reverse('recipies:tag-list')
+
+
+def dummy_recipe(user, title='pagination pie'):
+    """Creates a dummy recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=5,
+        price=5.00
+    )
+
+
+class CursorPaginationTests(TransactionTestCase):
+    """Test the list endpoints are paginated with cursors"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pages@cursor.com',
+            'keyset'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_recipes_paginated_newest_first(self):
+        """Test recipes are split into pages ordered by newest first"""
+        recipes = [dummy_recipe(self.user, f'recipe {i}') for i in range(5)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipes[4].id, recipes[3].id])
+        self.assertIsNotNone(res.data['next'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_page_size_capped(self):
+        """Test the requested page size cannot exceed the maximum"""
+        max_size = RecipeCursorPagination.max_page_size
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title='bulk', time_minutes=1, price=1.00)
+            for _ in range(max_size + 1)
+        ])
+
+        res = self.client.get(RECIPES_URL, {'page_size': max_size * 10})
+
+        self.assertEqual(len(res.data['results']), max_size)
+
+    def test_cursor_stable_across_inserts(self):
+        """Test new recipes do not shift the following page"""
+        recipes = [dummy_recipe(self.user, f'recipe {i}') for i in range(4)]
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        dummy_recipe(self.user, 'inserted meanwhile')
+
+        res = self.client.get(res.data['next'])
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipes[1].id, recipes[0].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_tags_paginated_by_name(self):
+        """Test tag pages follow name order across duplicate names"""
+        for name in ('b', 'a', 'b', 'c', 'a'):
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        url, params = TAGS_URL, {'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            names += [tag['name'] for tag in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(names, ['c', 'b', 'b', 'a', 'a'])
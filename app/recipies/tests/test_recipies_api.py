@@ -1,10 +1,14 @@
 import tempfile
 import os
 
+from unittest import skipUnless
+
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -60,7 +64,7 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTests(TestCase):
+class PrivateRecipeApiTests(TransactionTestCase):
     """Test authenticated recipe API access"""
 
     def setUp(self):
@@ -86,8 +90,8 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
 
     def test_fetching_recipes(self):
@@ -100,7 +104,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Testing viewing a recipe detail"""
@@ -171,6 +175,41 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_related_ids_batched(self):
+        """Test the query count does not grow with the tag ids"""
+        tags = [dummy_tag(user=self.user, name=f'tag {i}') for i in range(10)]
+
+        def count_queries(tag_ids):
+            payload = {
+                'title': 'batched', 'time_minutes': 1, 'price': 1.00,
+                'tags': tag_ids,
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPES_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(
+            count_queries([tags[0].id]),
+            count_queries([tag.id for tag in tags])
+        )
+
+    def test_create_recipe_foreign_ids_rejected(self):
+        """Test other users' and missing ids are all reported at once"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        own_tag = dummy_tag(user=self.user)
+        foreign_tag = dummy_tag(user=user2)
+        payload = {
+            'title': 'stolen tags', 'time_minutes': 1, 'price': 1.00,
+            'tags': [own_tag.id, foreign_tag.id, 9999],
+        }
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch"""
         recipe = dummy_recipe(user=self.user)
@@ -230,9 +269,9 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
         
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test fetch recipes using same inredients"""
@@ -255,9 +294,99 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)    
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])    
+
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all returns only recipes having every tag"""
+        recipe1 = dummy_recipe(user=self.user, title='paneer tikka')
+        recipe2 = dummy_recipe(user=self.user, title='dal fry')
+        tag1 = dummy_tag(user=self.user, name='veg')
+        tag2 = dummy_tag(user=self.user, name='spicy')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': '{},{}'.format(tag1.id, tag2.id), 'match': 'all'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [RecipeSerializer(recipe1).data]
+        )
+
+    def test_filter_recipes_matching_any_unique(self):
+        """Test recipes matching several filter ids are returned once"""
+        recipe = dummy_recipe(user=self.user, title='masala dosa')
+        ingredient1 = dummy_ingredient(user=self.user, name='potato')
+        ingredient2 = dummy_ingredient(user=self.user, name='rice')
+        recipe.ingredients.add(ingredient1, ingredient2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'ingredients': '{},{}'.format(ingredient1.id, ingredient2.id)}
+        )
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_recipes_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_match_ignored_outside_listing(self):
+        """Test match is only validated when listing recipes"""
+        recipe = dummy_recipe(user=self.user)
+
+        res = self.client.get(detail_url(recipe.id), {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+    def test_search_recipes(self):
+        """Test searching recipe titles, tag and ingredient names"""
+        recipe1 = dummy_recipe(user=self.user, title='lemon rice')
+        recipe2 = dummy_recipe(user=self.user, title='fish fry')
+        recipe2.tags.add(dummy_tag(user=self.user, name='lemon'))
+        recipe3 = dummy_recipe(user=self.user, title='lassi')
+        recipe3.ingredients.add(dummy_ingredient(user=self.user, name='lemon'))
+        dummy_recipe(user=self.user, title='plain rice')
+
+        res = self.client.get(RECIPES_URL, {'search': 'lemon'})
+
+        ids = {recipe['id'] for recipe in res.data['results']}
+        self.assertEqual(ids, {recipe1.id, recipe2.id, recipe3.id})
+
+    def test_search_follows_renamed_tag(self):
+        """Test search results follow tag renames"""
+        recipe = dummy_recipe(user=self.user, title='pancakes')
+        tag = dummy_tag(user=self.user, name='breakfast')
+        recipe.tags.add(tag)
+        tag.name = 'brunch'
+        tag.save()
+
+        res = self.client.get(RECIPES_URL, {'search': 'brunch'})
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(RECIPES_URL, {'search': 'breakfast'})
+        self.assertEqual(len(res.data['results']), 0)
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranked on postgres only')
+    def test_search_ranks_title_matches_first(self):
+        """Test title matches rank above ingredient matches"""
+        by_ingredient = dummy_recipe(user=self.user, title='tomato soup')
+        by_ingredient.ingredients.add(
+            dummy_ingredient(user=self.user, name='basil')
+        )
+        by_title = dummy_recipe(user=self.user, title='basil pesto')
+
+        res = self.client.get(RECIPES_URL, {'search': 'basil'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [by_title.id, by_ingredient.id])
 
 
 class RecipeImageUploadTests(TestCase):
@@ -281,8 +410,11 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
+        #the upload still has its metadata, its url isn't given out
+        self.assertIsNone(res.data['image'])
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_image_bad_request(self):
@@ -296,4 +428,55 @@ class RecipeImageUploadTests(TestCase):
         
 
         
-         
\ No newline at end of file
+         
+
+class RecipeQueryCountTests(TransactionTestCase):
+    """Test the recipe endpoints run a constant number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'count@queries.com',
+            'nplusone'
+        )
+        self.client.force_authenticate(self.user)
+
+    def dummy_recipes(self, count):
+        """Creates recipes each having a tag and an ingredient"""
+        for i in range(count):
+            recipe = dummy_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tags.add(dummy_tag(user=self.user, name=f'tag {i}'))
+            recipe.ingredients.add(
+                dummy_ingredient(user=self.user, name=f'ingredient {i}')
+            )
+
+    def count_queries(self, url):
+        """Return the number of queries run to fetch the url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes does not query per recipe"""
+        self.dummy_recipes(1)
+        few = self.count_queries(RECIPES_URL)
+        self.dummy_recipes(10)
+        many = self.count_queries(RECIPES_URL)
+
+        self.assertEqual(few, many)
+
+    def test_detail_query_count_constant(self):
+        """Test recipe detail does not query per related object"""
+        recipe = dummy_recipe(user=self.user)
+        recipe.tags.add(dummy_tag(user=self.user))
+        few = self.count_queries(detail_url(recipe.id))
+        for i in range(10):
+            recipe.tags.add(dummy_tag(user=self.user, name=f'tag {i}'))
+            recipe.ingredients.add(
+                dummy_ingredient(user=self.user, name=f'ingredient {i}')
+            )
+        many = self.count_queries(detail_url(recipe.id))
+
+        self.assertEqual(few, many)
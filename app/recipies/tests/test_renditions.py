@@ -0,0 +1,154 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from PIL import Image
+
+from core.models import Recipe
+
+from recipies import renditions
+
+
+def rendition_url(name, rendition='thumb', file_format='webp'):
+    return reverse('recipies:rendition', kwargs={
+        'rendition': rendition, 'file_format': file_format, 'name': name
+    })
+
+
+class RenditionCacheTests(TestCase):
+    """Test the on disk least recently used rendition cache"""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache = renditions.RenditionCache(cache_dir.name, 250)
+
+    def put(self, key):
+        path = self.cache.path(key * 20, 'webp')
+        self.cache.put(path, b'x' * 100)
+        return path
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used files go once over the cap"""
+        first, second = self.put('a'), self.put('b')
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        self.assertTrue(self.cache.touch(first))
+
+        third = self.put('c')
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+
+    def test_touch_keeps_modification_time(self):
+        """Test use is recorded without changing the file's validators"""
+        path = self.put('d')
+        os.utime(path, (1, 1))
+
+        self.assertTrue(self.cache.touch(path))
+
+        self.assertEqual(os.stat(path).st_mtime, 1)
+        self.assertGreater(os.stat(path).st_atime, 1)
+
+    def test_touch_missing(self):
+        """Test a missing file is reported as not cached"""
+        self.assertFalse(self.cache.touch(self.cache.path('d' * 20, 'jpeg')))
+
+
+class RenditionApiTests(TransactionTestCase):
+    """Test serving and referencing image renditions"""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = patch.object(renditions, 'cache', renditions.RenditionCache(
+            cache_dir.name, 10 * 1024 * 1024
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'renditions@book.com',
+            'resized'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='appam', time_minutes=20, price=2,
+            image_status=Recipe.IMAGE_READY
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 500), 'white').save(buffer, format='JPEG')
+        self.recipe.image.save('appam.jpg', ContentFile(buffer.getvalue()))
+        self.addCleanup(self.recipe.image.delete)
+
+    def test_rendition_rendered_and_cached(self):
+        """Test a rendition is rendered on first use and then reused"""
+        url = rendition_url(self.recipe.image.name)
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        image = Image.open(io.BytesIO(b''.join(res.streaming_content)))
+        self.assertEqual(image.size, (200, 100))
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_not_modified(self):
+        """Test a cached rendition is validated by its etag"""
+        url = rendition_url(self.recipe.image.name)
+        first = self.client.get(url)
+
+        res = self.client.get(
+            url, HTTP_IF_NONE_MATCH=first['ETag'],
+            HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], first['ETag'])
+        self.assertEqual(res['Last-Modified'], first['Last-Modified'])
+
+    def test_unknown_image_not_rendered(self):
+        """Test only stored recipe images are rendered"""
+        res = self.client.get(rendition_url('uploads/recipe/missing.jpg'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_rendition(self):
+        """Test unknown renditions and formats are not found"""
+        res = self.client.get(
+            rendition_url(self.recipe.image.name, rendition='huge')
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipe_lists_rendition_urls(self):
+        """Test recipes reference their renditions in each format"""
+        res = self.client.get(reverse('recipies:recipe-list'))
+
+        images = res.data['results'][0]['images']
+        self.assertEqual(set(images), set(renditions.RENDITIONS))
+        self.assertTrue(images['thumb']['jpeg'].endswith(rendition_url(
+            self.recipe.image.name, file_format='jpeg'
+        )))
+
+    def test_pending_image_has_no_renditions(self):
+        """Test renditions are only listed once the image is processed"""
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+        res = self.client.get(reverse('recipies:recipe-list'))
+
+        self.assertIsNone(res.data['results'][0]['images'])
@@ -0,0 +1,225 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+from django.test import TransactionTestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+from recipies import caching
+
+
+TAGS_URL = reverse('recipies:tag-list')
+INGREDIENTS_URL = reverse('recipies:ingredient-list')
+RECIPES_URL = reverse('recipies:recipe-list')
+
+
+def detail_url(recipe_id):
+    """returns the recipe detail URL"""
+    return reverse('recipies:recipe-detail', args=[recipe_id])
+
+
+@override_settings(API_CACHE_TIMEOUT=300)
+class ResponseCacheTests(TransactionTestCase):
+    """Test list and detail responses are cached per user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cached@responses.com',
+            'versioned'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='cached curry',
+            time_minutes=10,
+            price=5.00
+        )
+
+    def test_repeated_get_served_from_cache(self):
+        """Test repeating a GET does not query the database"""
+        self.client.get(RECIPES_URL)
+        self.client.get(detail_url(self.recipe.id))
+
+        with self.assertNumQueries(0):
+            list_res = self.client.get(RECIPES_URL)
+            detail_res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(len(list_res.data['results']), 1)
+        self.assertEqual(detail_res.data['title'], self.recipe.title)
+
+    def test_query_params_cached_separately(self):
+        """Test different query params are not served the same data"""
+        self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        res = self.client.get(RECIPES_URL, {'search': 'pie'})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_invalidated_by_api_write(self):
+        """Test creating a tag through the API refreshes the list"""
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'fresh'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_invalidated_by_m2m_change(self):
+        """Test tagging a recipe refreshes the cached detail"""
+        self.client.get(detail_url(self.recipe.id))
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='hot'))
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_not_shared_between_users(self):
+        """Test a user is never served another user's cached data"""
+        self.client.get(RECIPES_URL)
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_no_tag_or_ingredient_detail(self):
+        """Test tags and ingredients still have no detail endpoint"""
+        tag = Tag.objects.create(user=self.user, name='listed')
+
+        for url in (f'{TAGS_URL}{tag.id}/', f'{INGREDIENTS_URL}1/'):
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(API_CACHE_TIMEOUT=300)
+class ConditionalGetTests(TransactionTestCase):
+    """Test conditional GETs are answered without querying"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'conditional@get.com',
+            'notmodified'
+        )
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='polled')
+
+    def later(self, seconds=2):
+        """Move the clock past the second of the last write"""
+        return patch('time.time', return_value=time.time() + seconds)
+
+    def test_validators_returned(self):
+        """Test list responses carry an ETag and Last-Modified"""
+        with self.later():
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_no_last_modified_within_write_second(self):
+        """Test Last-Modified is left out until the second of the last
+        write is over, a later write could have the same date"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertIn('ETag', res)
+        self.assertNotIn('Last-Modified', res)
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching ETag gets a 304 without any query"""
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_if_modified_since_not_modified(self):
+        """Test an unchanged collection gets a 304 for If-Modified-Since"""
+        with self.later():
+            last_modified = self.client.get(TAGS_URL)['Last-Modified']
+            res = self.client.get(
+                TAGS_URL, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        """Test a stale ETag gets the new data"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.create(user=self.user, name='new')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertNotEqual(res['ETag'], etag)
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class ResponseCacheOffTests(TransactionTestCase):
+    """Test API_CACHE_TIMEOUT=0 turns caching and conditional GETs off"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'uncached@responses.com',
+            'everytime'
+        )
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='fresh')
+
+    def test_not_cached(self):
+        """Test each GET runs its queries and carries no validators"""
+        self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', res)
+        self.assertNotIn('Last-Modified', res)
+
+
+@override_settings(API_CACHE_TIMEOUT=300)
+class VersionBumpTests(TransactionTestCase):
+    """Test cached responses are invalidated when writes commit"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'committed@writes.com',
+            'oncommit'
+        )
+        self.version = caching.collection_version(self.user.pk)
+
+    def test_bumped_after_commit(self):
+        """Test the version is unchanged until the write commits"""
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name='pending')
+
+            self.assertEqual(
+                caching.collection_version(self.user.pk), self.version
+            )
+
+        self.assertNotEqual(
+            caching.collection_version(self.user.pk), self.version
+        )
+
+    def test_not_bumped_on_rollback(self):
+        """Test a rolled back write leaves the cached responses alone"""
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Tag.objects.create(user=self.user, name='undone')
+                raise ValueError
+
+        self.assertEqual(
+            caching.collection_version(self.user.pk), self.version
+        )
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TransactionTestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+
+from recipies import typeahead
+
+
+TAGS_TYPEAHEAD_URL = reverse('recipies:tag-typeahead')
+INGREDIENTS_TYPEAHEAD_URL = reverse('recipies:ingredient-typeahead')
+
+
+class TypeaheadApiTests(TransactionTestCase):
+    """Test the tag and ingredient typeahead lookups"""
+
+    def setUp(self):
+        typeahead.cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'type@ahead.com',
+            'autocomplete'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """Test that login is required for the lookup"""
+        res = APIClient().get(TAGS_TYPEAHEAD_URL, {'q': 'ca'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prefix_matches_first(self):
+        """Test names starting with the text are returned first"""
+        for name in ('cardamom', 'cashew', 'pecan', 'tomato'):
+            Ingredient.objects.create(user=self.user, name=name)
+
+        res = self.client.get(INGREDIENTS_TYPEAHEAD_URL, {'q': 'Ca'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [ingredient['name'] for ingredient in res.data]
+        self.assertCountEqual(names[:2], ['cardamom', 'cashew'])
+        self.assertNotIn('tomato', names)
+
+    def test_prefix_wildcards_escaped(self):
+        """Test % and _ in the text match themselves only"""
+        Tag.objects.create(user=self.user, name='50% rye')
+        Tag.objects.create(user=self.user, name='500g rye')
+
+        prefixed = Tag.objects.filter(name__iprefix='50%')
+
+        self.assertEqual([tag.name for tag in prefixed], ['50% rye'])
+
+    def test_results_limited(self):
+        """Test at most the top results are returned"""
+        for i in range(typeahead.TYPEAHEAD_LIMIT + 5):
+            Tag.objects.create(user=self.user, name=f'quick {i}')
+
+        res = self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'quick'})
+
+        self.assertEqual(len(res.data), typeahead.TYPEAHEAD_LIMIT)
+
+    def test_limited_to_user(self):
+        """Test only the authenticated user's names are matched"""
+        user2 = get_user_model().objects.create_user('other@a.com', 'pass')
+        Tag.objects.create(user=user2, name='dessert')
+
+        res = self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'des'})
+
+        self.assertEqual(res.data, [])
+
+    def test_repeated_lookup_cached(self):
+        """Test repeating a lookup does not query the database"""
+        Tag.objects.create(user=self.user, name='dinner')
+        self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'din'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'din'})
+        self.assertEqual(len(res.data), 1)
+
+    def test_cache_invalidated_on_create(self):
+        """Test new tags show up in lookups that were cached"""
+        Tag.objects.create(user=self.user, name='dinner')
+        self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'din'})
+        Tag.objects.create(user=self.user, name='dinner party')
+
+        res = self.client.get(TAGS_TYPEAHEAD_URL, {'q': 'din'})
+
+        self.assertEqual(len(res.data), 2)
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import transaction
+
+from core.lru import TTLCache
+
+
+TYPEAHEAD_LIMIT = getattr(settings, 'TYPEAHEAD_LIMIT', 10)
+
+#hot prefixes per user, so repeated keystrokes skip the database, entries
+#are dropped by recipies.signals when the user's tags/ingredients change
+cache = TTLCache(
+    maxsize=getattr(settings, 'TYPEAHEAD_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'TYPEAHEAD_CACHE_TTL', 60),
+)
+
+
+def lookup(model, user, text, limit=TYPEAHEAD_LIMIT):
+    """Return the top matching names of the user's tags or ingredients"""
+    key = (model._meta.label, user.pk, text.lower(), limit)
+    results = cache.get(key)
+    if results is None:
+        results = list(
+            model.objects.filter(user=user).typeahead(
+                text, limit
+            ).values('id', 'name')
+        )
+        cache.set(key, results)
+
+    return results
+
+
+def invalidate(model, user_id):
+    """Forget the cached lookups of a user for tags or ingredients once
+    the current transaction commits, a lookup before could cache the
+    old names again"""
+    label = model._meta.label
+    transaction.on_commit(
+        lambda: cache.delete_matching(lambda key: key[:2] == (label, user_id))
+    )
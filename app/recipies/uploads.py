@@ -0,0 +1,251 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.utils.translation import gettext as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, \
+                                      UnsupportedMediaType, ValidationError
+
+from PIL import Image
+
+from core.models import Recipe
+
+
+#received parts, best on the file system of MEDIA_ROOT so completed
+#uploads are renamed into place rather than copied
+UPLOAD_DIR = getattr(settings, 'IMAGE_UPLOAD_DIR', os.path.join(
+    settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(),
+    'recipe-image-uploads'
+))
+MAX_BYTES = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024)
+#seconds an unfinished upload can be resumed for
+EXPIRY = getattr(settings, 'IMAGE_UPLOAD_EXPIRY', 24 * 3600)
+CHUNK_SIZE = 64 * 1024
+
+#leading bytes of the accepted formats
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_BYTES = 12
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('The upload is at another offset.')
+    default_code = 'conflict'
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('The image is too large.')
+    default_code = 'too_large'
+
+
+def sniff(header):
+    """Extension of the image format the header bytes start, or None"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in SIGNATURES:
+        if header.startswith(signature):
+            return extension
+
+    return None
+
+
+class ImageUpload:
+    """A resumable upload of a recipe image
+
+    The bytes received so far are kept in UPLOAD_DIR next to a JSON file
+    describing the upload, so any process can take the next chunk. The
+    offset is the size of the received file.
+    """
+
+    def __init__(self, upload_id, recipe_id, user_id, size, started):
+        self.id = upload_id
+        self.recipe_id = recipe_id
+        self.user_id = user_id
+        self.size = size
+        self.started = started
+
+    @property
+    def path(self):
+        return os.path.join(UPLOAD_DIR, f'{self.id}.part')
+
+    @property
+    def info_path(self):
+        return os.path.join(UPLOAD_DIR, f'{self.id}.json')
+
+    @property
+    def offset(self):
+        return os.path.getsize(self.path)
+
+    @classmethod
+    def start(cls, recipe, size):
+        """Start uploading size bytes for the recipe"""
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise ValidationError(
+                {'size': [_('A valid integer is required.')]}
+            )
+        if size <= 0:
+            raise ValidationError({'size': [_('The image is empty.')]})
+        if size > MAX_BYTES:
+            raise UploadTooLarge()
+
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        cls.remove_expired()
+        upload = cls(
+            uuid.uuid4().hex, recipe.pk, recipe.user_id, size, time.time()
+        )
+        open(upload.path, 'xb').close()
+        with open(upload.info_path, 'x') as info:
+            json.dump({
+                'recipe_id': upload.recipe_id,
+                'user_id': upload.user_id,
+                'size': upload.size,
+                'started': upload.started,
+            }, info)
+
+        return upload
+
+    @classmethod
+    def get(cls, recipe, upload_id):
+        """The unexpired upload of the recipe with the id"""
+        try:
+            with open(os.path.join(UPLOAD_DIR, f'{upload_id}.json')) as info:
+                upload = cls(upload_id, **json.load(info))
+        except (FileNotFoundError, ValueError):
+            raise NotFound()
+        if (upload.recipe_id, upload.user_id) != (recipe.pk, recipe.user_id):
+            raise NotFound()
+        if upload.started + EXPIRY < time.time():
+            upload.remove()
+            raise NotFound()
+
+        return upload
+
+    @classmethod
+    def remove_expired(cls):
+        """Forget uploads nobody finished in time"""
+        cutoff = time.time() - EXPIRY
+        for entry in os.scandir(UPLOAD_DIR):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def remove(self):
+        for path in (self.path, self.info_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def append(self, offset, stream, length, recipe):
+        """Write length bytes of the stream at offset, return the new offset
+
+        Chunks are written as they are read. The size and, once the first
+        bytes are in, the format are checked before the rest is received.
+        The chunk completing the upload attaches it to the recipe before
+        the lock is released, so an upload is finished once.
+        """
+        try:
+            part = open(self.path, 'r+b')
+        except FileNotFoundError: #finished or given up meanwhile
+            raise NotFound()
+        with part:
+            try:
+                fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict(_('Another chunk is being written.'))
+            if not self._is_current(part):
+                raise NotFound()
+            received = part.seek(0, os.SEEK_END)
+            if offset != received:
+                raise UploadConflict({'offset': received})
+            if received + length > self.size:
+                raise UploadTooLarge(_('The chunk is past the declared size.'))
+
+            while length:
+                chunk = stream.read(min(CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                part.write(chunk)
+                length -= len(chunk)
+                received += len(chunk)
+                if received - len(chunk) < SNIFF_BYTES:
+                    self._check_format(part, received)
+
+            if received == self.size:
+                part.flush()
+                self._attach(part, recipe)
+
+        return received
+
+    def _is_current(self, part):
+        """Whether the open part is still the upload's, a finished upload
+        was moved away while waiting"""
+        try:
+            return os.stat(self.path).st_ino == os.fstat(part.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _check_format(self, part, received):
+        if received < min(SNIFF_BYTES, self.size):
+            return
+        part.flush()
+        with open(self.path, 'rb') as header:
+            if sniff(header.read(SNIFF_BYTES)) is None:
+                self.remove()
+                raise UnsupportedMediaType(
+                    None, _('The file is not a JPEG, PNG, GIF or WebP image.')
+                )
+
+    def _attach(self, part, recipe):
+        """Verify the received image and make it the recipe's image"""
+        part.seek(0)
+        extension = sniff(part.read(SNIFF_BYTES))
+        part.seek(0)
+        try:
+            with Image.open(part) as image:
+                image.verify()
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            self.remove()
+            raise ValidationError({'image': [_(
+                'Upload a valid image. The file you uploaded was either '
+                'not an image or a corrupted image.'
+            )]})
+
+        #the part file is renamed into the storage in one step
+        part.seek(0)
+        recipe.image.save(
+            f'image.{extension}', _ReceivedFile(part, self.path),
+            save=False
+        )
+        recipe.image_status = Recipe.IMAGE_PENDING
+        recipe.save()
+        self.remove()
+
+
+class _ReceivedFile(File):
+    """A received part the storage can move instead of copy"""
+
+    def __init__(self, file, path):
+        super().__init__(file, os.path.basename(path))
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
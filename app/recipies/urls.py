@@ -12,5 +12,7 @@ router.register('recipies', views.RecipeViewSet)
 app_name = 'recipies'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('renditions/<str:rendition>/<str:file_format>/<path:name>',
+         views.rendition, name='rendition'),
 ]
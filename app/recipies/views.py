@@ -1,39 +1,67 @@
+import os
+
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils.translation import gettext as _
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from rest_framework import viewsets, mixins,status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 
+from PIL import Image
+
+from core import media
 from core.models import Tag, Ingredient ,Recipe
 
-from recipies import serializer
+from recipies import serializer, pagination, typeahead, export, importer, \
+                     images, renditions, uploads
+from recipies.bulk import RecipeBulkWriter
+from recipies.caching import CachedListMixin, CachedResponseMixin
+
+from user.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(CachedListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication, SignedTokenAuthentication
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = pagination.RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return objects for current user"""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.assigned()
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return queryset.with_recipe_count().order_by('-name')
 
     def perform_create(self, serializer):
         """Create a new ingredient"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False)
+    def typeahead(self, request):
+        """Return the best matches for the partial name in q"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response([])
+
+        return Response(
+            typeahead.lookup(self.queryset.model, request.user, text)
+        )
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
@@ -46,32 +74,74 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = serializer.IngredientSerializer
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializer.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication, SignedTokenAuthentication
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = pagination.RecipeCursorPagination
+    #relations each action's serializer renders, loaded in bulk per request
+    prefetch_for_action = {
+        'list': ('tags', 'ingredients'),
+        'retrieve': (
+            Prefetch('tags', queryset=Tag.objects.with_recipe_count()),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.with_recipe_count()
+            ),
+        ),
+        'update': ('tags', 'ingredients'),
+        'partial_update': ('tags', 'ingredients'),
+    }
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _match_all(self):
+        """Whether recipes must have all of the filtered tags/ingredients,
+        only the listing actions take match"""
+        if self.action not in ('list', 'export'):
+            return False
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('all', 'any'):
+            raise ValidationError({'match': _('must be "all" or "any"')})
+
+        return match == 'all'
+
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        match_all = self._match_all()
         queryset = self.queryset
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.linked_to('tags', tag_ids, match_all)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.linked_to(
+                'ingredients', ingredient_ids, match_all
+            )
+
+        if search:
+            queryset = queryset.search(search)
+        queryset = queryset.filter(user=self.request.user)
 
-        return queryset.filter(user=self.request.user)
+        return self._prefetch_for_action(queryset)
 
+    def _prefetch_for_action(self, queryset):
+        """Prefetch the relations needed by the current action"""
+        lookups = self.prefetch_for_action.get(self.action, ())
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -89,7 +159,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Upload an image to a recipe
+
+        The upload is stored as is and accepted right away, it is resized
+        and stripped of its metadata in the background. image_status tells
+        when that is done.
+        """
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
@@ -97,13 +172,173 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save(image_status=Recipe.IMAGE_PENDING)
+            images.schedule(recipe)
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
             )
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
-        )
\ No newline at end of file
+        )
+
+    @action(methods=['POST'], detail=True, url_path='image-uploads')
+    def start_image_upload(self, request, pk=None):
+        """Start a resumable image upload of the given size in bytes
+
+        Chunks are then sent with PATCH to the upload, see image_upload.
+        """
+        recipe = self.get_object()
+        upload = uploads.ImageUpload.start(recipe, request.data.get('size'))
+
+        return self._upload_response(upload, 0, status.HTTP_201_CREATED)
+
+    @action(methods=['GET', 'PATCH'], detail=True,
+            url_path=r'image-uploads/(?P<upload_id>[0-9a-f]{32})')
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Report how much of an upload was received or take the next
+        chunk
+
+        A chunk is the raw request body, the Upload-Offset header tells
+        where it starts. The image is attached to the recipe and processed
+        once the last chunk is in.
+        """
+        recipe = self.get_object()
+        upload = uploads.ImageUpload.get(recipe, upload_id)
+        if request.method == 'GET':
+            return self._upload_response(upload, upload.offset)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            raise ValidationError(_(
+                'Upload-Offset and Content-Length headers are required.'
+            ))
+        received = upload.append(offset, request.stream, length, recipe)
+        if received < upload.size:
+            return self._upload_response(upload, received)
+
+        images.schedule(recipe)
+        response = self._upload_response(upload, upload.size)
+        response.data['recipe'] = serializer.RecipeImageSerializer(
+            recipe, context=self.get_serializer_context()
+        ).data
+
+        return response
+
+    def _upload_response(self, upload, offset, status_code=status.HTTP_200_OK):
+        response = Response({
+            'id': upload.id,
+            'size': upload.size,
+            'offset': offset,
+        }, status=status_code)
+        response['Upload-Offset'] = offset
+
+        return response
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, partially update or delete many recipes at once
+
+        POST and PATCH take a list of recipes, PATCH items need an id.
+        DELETE takes a list of recipe ids. Nothing is written if any item
+        is invalid, errors are reported per item.
+        """
+        writer = RecipeBulkWriter(request.user)
+        if request.method == 'DELETE':
+            ids = request.data
+            if not isinstance(ids, list) or \
+                    not all(isinstance(pk, int) for pk in ids):
+                raise ValidationError(_('Expected a list of recipe ids'))
+            return Response({'deleted': writer.delete(ids)})
+
+        partial = request.method == 'PATCH'
+        validated = writer.validate(request.data, partial=partial)
+        if not writer.is_valid:
+            return Response(
+                {'errors': writer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if partial:
+            return Response({'ids': writer.update(validated)})
+
+        return Response(
+            {'ids': writer.create(validated)},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or, with
+        export_format=csv, as CSV"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in export.FORMATS:
+            raise ValidationError(
+                {'export_format': _('must be "ndjson" or "csv"')}
+            )
+        lines, content_type = export.FORMATS[export_format]
+
+        response = StreamingHttpResponse(
+            lines(export.recipe_rows(self.get_queryset())),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_format}"'
+
+        return response
+
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        """Import recipes from an uploaded NDJSON or CSV file
+
+        The format is taken from import_format or the file name. Tags and
+        ingredients are matched by name and created when missing.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': [_('No file was submitted.')]})
+        file_format = request.query_params.get(
+            'import_format', importer.import_format(upload.name)
+        )
+        if file_format not in export.FORMATS:
+            raise ValidationError(
+                {'import_format': _('must be "ndjson" or "csv"')}
+            )
+
+        try:
+            count = importer.RecipeImporter(request.user).load(
+                importer.parse_rows(upload, file_format)
+            )
+        except importer.ImportRowError as exc:
+            raise ValidationError({'file': [str(exc)]})
+
+        return Response({'count': count}, status=status.HTTP_201_CREATED)
+
+
+def rendition(request, rendition, file_format, name):
+    """Serve a resized copy of a stored recipe image, rendered on first
+    use and kept in the rendition cache"""
+    if rendition not in renditions.RENDITIONS or \
+            file_format not in renditions.FORMATS:
+        raise Http404
+    path = renditions.rendition_path(name, rendition, file_format)
+    if not renditions.cache.touch(path):
+        #only stored recipe images are rendered
+        if not Recipe.objects.filter(image=name).exists():
+            raise Http404
+        try:
+            path = renditions.render(name, rendition, file_format)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise Http404
+
+    #the rendition sizes may be changed, so the urls aren't immutable. The
+    #file name hashes everything the content depends on, a render after
+    #eviction keeps the etag
+    return media.file_response(
+        request, path, content_type=renditions.FORMATS[file_format][1],
+        etag=f'"{os.path.basename(path)}"', max_age=86400
+    )
@@ -0,0 +1,88 @@
+import copy
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, \
+    TokenAuthentication, get_authorization_header
+
+from core.db import replicas
+from core.lru import TTLCache
+from user import tokens
+
+
+#token key -> (user, token), dropped by user.signals when the token is
+#deleted or the user changes, the ttl bounds staleness in other processes
+token_cache = TTLCache(
+    maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+#seconds a stored token is accepted for after it was created, 0 for ever
+TOKEN_EXPIRY = getattr(settings, 'TOKEN_EXPIRY', 0)
+
+
+def token_expired(token):
+    """Whether a stored token is older than TOKEN_EXPIRY"""
+    return bool(TOKEN_EXPIRY) and \
+        token.created < timezone.now() - timedelta(seconds=TOKEN_EXPIRY)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token to user lookup"""
+
+    def authenticate_credentials(self, key):
+        """Return the cached user and token or look them up"""
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        if token_expired(token):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        replicas.authenticated(user)
+
+        #each request gets its own copy, views may modify request.user
+        return copy.copy(user), token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authentication with signed access tokens from user.tokens
+
+    Clients send "Authorization: Bearer <access token>". The token is
+    verified with its signature alone, request.user is an unsaved user
+    with only its pk set and request.auth the token's claims.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not tokens.SIGNED_TOKENS or not auth or \
+                auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header.')
+            )
+
+        try:
+            claims = tokens.verify(auth[1].decode())
+        except (UnicodeError, ValueError) as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        user = get_user_model()(pk=claims.user_id)
+        replicas.authenticated(user)
+
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def invalidate_tokens(*keys):
+    """Forget the cached lookups of the token keys"""
+    for key in keys:
+        token_cache.delete(key)
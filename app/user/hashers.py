@@ -0,0 +1,135 @@
+import base64
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+
+#passwords hashed at once per process, one per core by default so a
+#login storm can't take every cpu from the other requests. Hashing
+#releases the gil, the other request threads keep running meanwhile
+HASHER_WORKERS = getattr(settings, 'HASHER_WORKERS', os.cpu_count() or 1)
+
+_slots = threading.BoundedSemaphore(HASHER_WORKERS)
+_hashing = threading.local()
+
+
+def bounded(func, *args, **kwargs):
+    """Run func on this thread once fewer than HASHER_WORKERS hash"""
+    if getattr(_hashing, 'active', False): #already holds a slot
+        return func(*args, **kwargs)
+
+    with _slots:
+        _hashing.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _hashing.active = False
+
+
+class ScryptPasswordHasher(hashers.BasePasswordHasher):
+    """Memory hard hashing with scrypt from the standard library
+
+    The cost is set by PASSWORD_SCRYPT_N, _R and _P. Hashes made with
+    other costs still verify and are upgraded on the next login.
+    """
+    algorithm = 'scrypt'
+    work_factor = getattr(settings, 'PASSWORD_SCRYPT_N', 2 ** 14)
+    block_size = getattr(settings, 'PASSWORD_SCRYPT_R', 8)
+    parallelism = getattr(settings, 'PASSWORD_SCRYPT_P', 1)
+
+    def encode(self, password, salt, work_factor=None, block_size=None,
+               parallelism=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        work_factor = work_factor or self.work_factor
+        block_size = block_size or self.block_size
+        parallelism = parallelism or self.parallelism
+        digest = bounded(
+            hashlib.scrypt, password.encode(), salt=salt.encode(),
+            n=work_factor, r=block_size, p=parallelism, dklen=64,
+            #openssl refuses to use over 32MB unless allowed
+            maxmem=256 * work_factor * block_size * parallelism
+        )
+        digest = base64.b64encode(digest).decode('ascii').strip()
+
+        return '%s$%d$%s$%d$%d$%s' % (
+            self.algorithm, work_factor, salt, block_size, parallelism,
+            digest
+        )
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, digest = \
+            encoded.split('$', 5)
+        assert algorithm == self.algorithm
+
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': digest,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password, decoded['salt'], decoded['work_factor'],
+            decoded['block_size'], decoded['parallelism']
+        )
+
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): hashers.mask_hash(decoded['salt']),
+            _('hash'): hashers.mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+
+        return (decoded['work_factor'], decoded['block_size'],
+                decoded['parallelism']) != \
+            (self.work_factor, self.block_size, self.parallelism)
+
+    def harden_runtime(self, password, encoded):
+        #every hash of the same cost takes as long
+        pass
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the cost from PASSWORD_ARGON2_TIME_COST, _MEMORY_COST
+    (KiB) and _PARALLELISM, at most HASHER_WORKERS at once"""
+    time_cost = getattr(settings, 'PASSWORD_ARGON2_TIME_COST', 2)
+    memory_cost = getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', 19456)
+    parallelism = getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', 1)
+
+    def encode(self, password, salt):
+        return bounded(super().encode, password, salt)
+
+    def verify(self, password, encoded):
+        return bounded(super().verify, password, encoded)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with PASSWORD_PBKDF2_ITERATIONS, at most HASHER_WORKERS at
+    once"""
+    iterations = getattr(
+        settings, 'PASSWORD_PBKDF2_ITERATIONS',
+        hashers.PBKDF2PasswordHasher.iterations
+    )
+
+    def encode(self, password, salt, iterations=None):
+        return bounded(super().encode, password, salt, iterations)
@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """compares the cost of a login with each configured hasher"""
+    help = ('Benchmark password verification, the cpu bound part of a '
+            'login, with each hasher in PASSWORD_HASHERS. Reports logins/s '
+            'on one core and with concurrent logins.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.stdout.write(
+            f'{"hasher":<14} {"ms/login":>9} {"logins/s/core":>14} '
+            f'{"logins/s":>9}'
+        )
+        for hasher in get_hashers():
+            try:
+                if hasher.library:
+                    hasher._load_library()
+                encoded = hasher.encode('benchmark password', hasher.salt())
+            except ValueError: #the hashing library isn't installed
+                self.stdout.write(f'{hasher.algorithm:<14} not installed')
+                continue
+            self._run(hasher, encoded, options)
+
+    def _run(self, hasher, encoded, options):
+        """Print the time per login and the logins per second"""
+        def login(_number):
+            assert hasher.verify('benchmark password', encoded)
+
+        start = time.perf_counter()
+        for number in range(options['logins']):
+            login(number)
+        serial = (time.perf_counter() - start) / options['logins']
+
+        count = options['logins'] * options['threads']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(login, range(count)))
+        concurrent = count / (time.perf_counter() - start)
+
+        self.stdout.write(
+            f'{hasher.algorithm:<14} {serial * 1000:>9.2f} '
+            f'{1 / serial:>14.1f} {concurrent:>9.1f}'
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication, token_cache
+from user.views import ManageUserView
+
+
+class Command(BaseCommand):
+    """compares plain and cached token authentication on the me endpoint"""
+    help = ('Benchmark authenticated requests with and without the token '
+            'lookup cache. Sample data is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                'benchmark@token.local'
+            )
+            token = Token.objects.create(user=user)
+            token_cache.clear()
+            self.stdout.write(
+                f'{"authentication":<28} {"queries/req":>11} {"ms/req":>8}'
+            )
+            for auth_class in (TokenAuthentication,
+                               CachedTokenAuthentication):
+                self._run(auth_class, token.key, options['requests'])
+            self.stdout.write(
+                f'cache hits {token_cache.hits} misses {token_cache.misses}'
+            )
+            transaction.set_rollback(True)
+
+    def _run(self, auth_class, key, count):
+        """Print the queries and time per request for the auth class"""
+        view = ManageUserView.as_view(authentication_classes=(auth_class,))
+        request = APIRequestFactory().get(
+            '/api/user/me/', HTTP_AUTHORIZATION=f'Token {key}'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                view(request).render()
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'{auth_class.__name__:<28} '
+            f'{len(queries.captured_queries) / count:>11.2f} '
+            f'{elapsed * 1000 / count:>8.3f}'
+        )
@@ -3,6 +3,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from user import tokens
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user """
@@ -54,3 +56,16 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for a signed refresh token"""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate_refresh(self, value):
+        """Validate the token and return its claims"""
+        try:
+            return tokens.verify(value, tokens.REFRESH)
+        except ValueError:
+            err = _('invalid or expired refresh token')
+            raise serializers.ValidationError(err, code='authorization')
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'cached@token.com',
+            'lookup123',
+            name='cached'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_query(self):
+        """Test the token lookup only queries on the first request"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((token_cache.hits, token_cache.misses), (1, 1))
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating at once"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops authenticating at once"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_not_stale(self):
+        """Test the cached user follows profile updates"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'renamed'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'renamed')
+
+
+class BenchmarkTokenAuthCommandTests(TestCase):
+    """Test the token authentication benchmark command"""
+
+    def test_benchmark_reports_both_classes(self):
+        """Test both authentication classes are timed"""
+        out = StringIO()
+
+        call_command('benchmark_token_auth', requests=5, stdout=out)
+
+        self.assertIn('CachedTokenAuthentication', out.getvalue())
+        self.assertFalse(Token.objects.exists())
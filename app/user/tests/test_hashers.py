@@ -0,0 +1,131 @@
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hashers, make_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import hashers
+
+
+TOKEN_URL = reverse('user:token')
+
+
+class ScryptHasherTests(SimpleTestCase):
+    """Test hashing passwords with scrypt"""
+
+    def setUp(self):
+        self.hasher = hashers.ScryptPasswordHasher()
+
+    def test_verify(self):
+        """Test a hash verifies its password only"""
+        encoded = self.hasher.encode('recipes4all', self.hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$16384$'))
+        self.assertTrue(self.hasher.verify('recipes4all', encoded))
+        self.assertFalse(self.hasher.verify('recipes4none', encoded))
+
+    def test_must_update_when_cost_changes(self):
+        """Test hashes of another cost are upgraded"""
+        encoded = self.hasher.encode('recipes4all', 'salt', 2 ** 10)
+
+        self.assertTrue(self.hasher.verify('recipes4all', encoded))
+        self.assertTrue(self.hasher.must_update(encoded))
+        self.assertFalse(self.hasher.must_update(
+            self.hasher.encode('recipes4all', 'salt')
+        ))
+
+    def test_safe_summary_masks_hash(self):
+        """Test the summary doesn't reveal the salt or hash"""
+        encoded = self.hasher.encode('recipes4all', 'seasalt')
+
+        summary = self.hasher.safe_summary(encoded)
+
+        self.assertEqual(summary['work factor'], 16384)
+        self.assertNotIn('seasalt', summary['salt'])
+
+    def test_hashing_bounded(self):
+        """Test hashes wait for a free slot, nested calls run inline"""
+        done = threading.Event()
+        with patch.object(hashers, '_slots', threading.BoundedSemaphore(1)):
+            hashers._slots.acquire()
+            thread = threading.Thread(
+                target=hashers.bounded, args=(hashers.bounded, done.set)
+            )
+            thread.start()
+
+            self.assertFalse(done.wait(0.1))
+            hashers._slots.release()
+            thread.join(5)
+
+        self.assertTrue(done.is_set())
+
+
+class RehashOnLoginTests(TestCase):
+    """Test stored hashes move to the preferred hasher on login"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.preferred = get_hashers()[0].algorithm
+
+    def login(self, user):
+        res = self.client.post(
+            TOKEN_URL, {'email': user.email, 'password': 'recipes4all'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+
+    def test_new_passwords_use_preferred_hasher(self):
+        """Test users are created with the preferred hasher"""
+        user = get_user_model().objects.create_user(
+            'new@hashes.com', 'recipes4all'
+        )
+
+        self.assertTrue(user.password.startswith(f'{self.preferred}$'))
+
+    def test_old_hasher_upgraded(self):
+        """Test a PBKDF2 hash is replaced on the next login"""
+        user = get_user_model().objects.create_user('old@hashes.com')
+        user.password = make_password(
+            'recipes4all', hasher='pbkdf2_sha256'
+        )
+        user.save()
+
+        self.login(user)
+
+        self.assertTrue(user.password.startswith(f'{self.preferred}$'))
+        self.assertTrue(user.check_password('recipes4all'))
+
+    def test_old_cost_upgraded(self):
+        """Test a hash of a lower scrypt cost is replaced on login"""
+        with patch.object(hashers.ScryptPasswordHasher, 'work_factor',
+                          2 ** 10):
+            user = get_user_model().objects.create_user(
+                'cheap@hashes.com', 'recipes4all'
+            )
+            old = user.password
+
+        self.login(user)
+
+        self.assertNotEqual(user.password, old)
+        self.assertTrue(user.check_password('recipes4all'))
+
+
+class BenchmarkHashersCommandTests(SimpleTestCase):
+    """Test the password hasher benchmark command"""
+
+    def test_benchmark(self):
+        """Test a line is printed for every configured hasher"""
+        out = StringIO()
+
+        call_command('benchmark_hashers', logins=1, threads=2, stdout=out)
+
+        self.assertEqual(
+            len(out.getvalue().splitlines()), len(get_hashers()) + 1
+        )
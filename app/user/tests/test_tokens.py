@@ -0,0 +1,261 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import RevokedToken
+from user import tokens
+from user.authentication import token_cache
+
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipies:recipe-list')
+
+
+class SignedTokenTests(TestCase):
+    """Test signing and verifying tokens"""
+
+    def setUp(self):
+        tokens.revoked.clear()
+        self.user = get_user_model().objects.create_user(
+            'signed@token.com', 'recipes4all'
+        )
+
+    def test_round_trip(self):
+        """Test a token verifies to its claims without queries"""
+        pair = tokens.issue(self.user)
+
+        with self.assertNumQueries(0):
+            claims = tokens.verify(pair['access'])
+
+        self.assertEqual(claims.user_id, self.user.pk)
+        self.assertEqual(claims.kind, tokens.ACCESS)
+
+    def test_tampered_rejected(self):
+        """Test a token with changed claims is rejected"""
+        access = tokens.issue(self.user)['access']
+        other = access.replace(f'.{self.user.pk}.', f'.{self.user.pk + 1}.')
+
+        for token in (other, access[:-1], '', 'not.a.token', access + 'é'):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(token)
+
+    def test_wrong_kind_rejected(self):
+        """Test a refresh token isn't accepted as an access token"""
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(tokens.issue(self.user)['refresh'])
+
+    def test_expired_rejected(self):
+        """Test a token is rejected after its lifetime"""
+        access = tokens.encode(tokens.ACCESS, self.user, -1)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(access)
+
+    def test_refresh_rotates(self):
+        """Test refreshing issues a new pair and revokes the old token"""
+        old = tokens.issue(self.user)['refresh']
+
+        pair = tokens.refresh(tokens.verify(old, tokens.REFRESH))
+
+        self.assertEqual(tokens.verify(pair['access']).user_id, self.user.pk)
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(old, tokens.REFRESH)
+
+    def test_refresh_used_once(self):
+        """Test of two refreshes racing with one token only one wins"""
+        refresh = tokens.issue(self.user)['refresh']
+        first = tokens.verify(refresh, tokens.REFRESH)
+        second = tokens.verify(refresh, tokens.REFRESH)
+
+        tokens.refresh(first)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'already used'):
+            tokens.refresh(second)
+
+    def test_password_change_ends_refresh(self):
+        """Test a refresh token stops working when the password changes"""
+        refresh = tokens.issue(self.user)['refresh']
+        self.user.set_password('recipes4none')
+        self.user.save()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.refresh(tokens.verify(refresh, tokens.REFRESH))
+
+    def test_revoked_by_other_process(self):
+        """Test a revocation elsewhere is seen after the list reloads"""
+        refresh = tokens.issue(self.user)['refresh']
+        claims = tokens.verify(refresh, tokens.REFRESH)
+        RevokedToken.objects.create(
+            jti=claims.jti, expires=timezone.now() + timedelta(minutes=5)
+        )
+        tokens.revoked.clear()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(refresh, tokens.REFRESH)
+
+    def test_revoking_twice(self):
+        """Test revoking a revoked token changes nothing"""
+        claims = tokens.verify(
+            tokens.issue(self.user)['refresh'], tokens.REFRESH
+        )
+
+        tokens.revoke(claims)
+        tokens.revoke(claims)
+
+        self.assertEqual(RevokedToken.objects.filter(
+            jti=claims.jti
+        ).count(), 1)
+
+
+@patch('user.tokens.SIGNED_TOKENS', True)
+class SignedTokenApiTests(TestCase):
+    """Test the signed token endpoints and authentication"""
+
+    def setUp(self):
+        tokens.revoked.clear()
+        self.user = get_user_model().objects.create_user(
+            'signed@token.com', 'recipes4all', name='signed'
+        )
+        self.client = APIClient()
+
+    def login(self):
+        res = self.client.post(
+            TOKEN_URL, {'email': self.user.email, 'password': 'recipes4all'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.data
+
+    def test_login_returns_pair(self):
+        """Test logging in returns the stored token and a signed pair"""
+        data = self.login()
+
+        self.assertEqual(
+            set(data), {'token', 'access', 'refresh', 'expires_in'}
+        )
+        self.assertEqual(data['token'], Token.objects.get(user=self.user).key)
+
+    def test_access_token_authenticates(self):
+        """Test recipes are listed with a signed token"""
+        access = self.login()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_me_loads_user(self):
+        """Test the profile is read from the database with a signed token"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.login()["access"]}'
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_bad_access_token_rejected(self):
+        """Test a forged token is refused with the token challenge"""
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer 1.a.1.2.3.4.5')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_refresh_endpoint(self):
+        """Test a refresh token is exchanged once"""
+        refresh = self.login()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        again = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_endpoint_reports_why(self):
+        """Test a refresh by a changed user says the token is no longer
+        valid"""
+        refresh = self.login()['refresh']
+        self.user.set_password('recipes4none')
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['refresh'], ['token no longer valid'])
+
+    def test_revoke_endpoint(self):
+        """Test a revoked refresh token can't be used"""
+        refresh = self.login()['refresh']
+
+        res = self.client.post(REVOKE_URL, {'refresh': refresh})
+        again = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_disabled(self):
+        """Test the signed endpoints and tokens are off by default"""
+        refresh = self.login()['refresh']
+        access = tokens.issue(self.user)['access']
+
+        with patch('user.tokens.SIGNED_TOKENS', False):
+            res = self.client.post(REFRESH_URL, {'refresh': refresh})
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            listed = self.client.get(RECIPES_URL)
+            login = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(listed.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(set(login), {'token'})
+
+
+class TokenExpiryTests(TestCase):
+    """Test stored tokens expire and are replaced on login"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'old@token.com', 'recipes4all'
+        )
+        self.token = Token.objects.create(user=self.user)
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now() - timedelta(days=2)
+        )
+        self.client = APIClient()
+
+    def test_old_token_works_without_expiry(self):
+        """Test existing tokens keep working unless TOKEN_EXPIRY is set"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch('user.authentication.TOKEN_EXPIRY', 24 * 3600)
+    def test_expired_token_rejected_and_rotated(self):
+        """Test an expired token is refused and replaced on login"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        res = self.client.get(ME_URL)
+        login = self.client.post(
+            TOKEN_URL, {'email': self.user.email, 'password': 'recipes4all'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotEqual(login.data['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from core.bloom import BloomFilter
+from core.models import RevokedToken
+
+
+#issue short lived signed access tokens, verified without the database,
+#with a refresh token next to the stored token on login
+SIGNED_TOKENS = getattr(settings, 'SIGNED_TOKENS', False)
+#seconds an access token is accepted for, it can't be recalled sooner:
+#access tokens are checked by their signature alone, revoking or
+#refreshing ends the session once the current one expires
+ACCESS_LIFETIME = getattr(settings, 'SIGNED_TOKEN_ACCESS_LIFETIME', 300)
+#seconds a refresh token can be exchanged for a new pair
+REFRESH_LIFETIME = getattr(
+    settings, 'SIGNED_TOKEN_REFRESH_LIFETIME', 14 * 24 * 3600
+)
+#seconds the list of revoked refresh tokens is reused for in each process
+REVOCATION_RELOAD = getattr(settings, 'SIGNED_TOKEN_REVOCATION_RELOAD', 5)
+
+#a key of its own, so a signature made here is no use anywhere else
+_KEY = hashlib.sha256(
+    b'user.tokens' +
+    getattr(settings, 'SIGNED_TOKEN_KEY', settings.SECRET_KEY).encode()
+).digest()
+
+ACCESS = 'a'
+REFRESH = 'r'
+VERSION = '1'
+
+Claims = namedtuple('Claims', 'kind user_id expires jti stamp')
+
+
+class InvalidToken(ValueError):
+    """The token is malformed, forged, expired or revoked"""
+
+
+def _sign(payload):
+    digest = hmac.new(_KEY, payload.encode(), hashlib.sha256).digest()
+
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def password_stamp(user):
+    """Changes with the user's password, refreshing needs the same one"""
+    return hmac.new(
+        _KEY, user.password.encode(), hashlib.sha256
+    ).hexdigest()[:12]
+
+
+def encode(kind, user, lifetime):
+    """A token of kind for user, valid for lifetime seconds"""
+    payload = '.'.join((
+        VERSION, kind, str(user.pk), str(int(time.time()) + lifetime),
+        secrets.token_hex(8), password_stamp(user)
+    ))
+
+    return f'{payload}.{_sign(payload)}'
+
+
+def issue(user):
+    """A new access and refresh token pair for user"""
+    return {
+        'access': encode(ACCESS, user, ACCESS_LIFETIME),
+        'refresh': encode(REFRESH, user, REFRESH_LIFETIME),
+        'expires_in': ACCESS_LIFETIME,
+    }
+
+
+def decode(token, kind=ACCESS):
+    """The claims of a genuine, unexpired token, raises InvalidToken"""
+    payload, _, signature = token.rpartition('.')
+    if not hmac.compare_digest(_sign(payload).encode(),
+                               signature.encode()):
+        raise InvalidToken('invalid signature')
+    version, token_kind, user_id, expires, jti, stamp = payload.split('.')
+    if version != VERSION or token_kind != kind:
+        raise InvalidToken('wrong token type')
+    claims = Claims(token_kind, int(user_id), int(expires), jti, stamp)
+    if claims.expires <= time.time():
+        raise InvalidToken('token expired')
+
+    return claims
+
+
+def verify(token, kind=ACCESS):
+    """decode, rejecting revoked refresh tokens as well
+
+    Access tokens aren't looked up, verifying them needs no queries.
+    """
+    claims = decode(token, kind)
+    if kind == REFRESH and claims.jti in revoked:
+        raise InvalidToken('token revoked')
+
+    return claims
+
+
+def _add_revoked(claims):
+    """Store the refresh token's id, IntegrityError if it is there"""
+    now = datetime.now(timezone.utc)
+    #the list only holds tokens that are still valid
+    RevokedToken.objects.filter(expires__lte=now).delete()
+    with transaction.atomic():
+        RevokedToken.objects.create(
+            jti=claims.jti,
+            expires=datetime.fromtimestamp(claims.expires, timezone.utc),
+        )
+    revoked.add(claims.jti)
+
+
+def revoke(claims):
+    """Stop accepting the refresh token everywhere, until it would have
+    expired"""
+    try:
+        _add_revoked(claims)
+    except IntegrityError: #revoked already
+        pass
+
+
+def refresh(claims):
+    """Exchange verified refresh claims for a new pair, revoking them
+
+    The user is loaded, so a deactivated user or a changed password ends
+    the session at the next refresh. Revoking is the unique insert of the
+    token's id, of two requests racing with the same token one wins.
+    """
+    user = get_user_model().objects.filter(
+        pk=claims.user_id, is_active=True
+    ).first()
+    if user is None or not hmac.compare_digest(
+            password_stamp(user), claims.stamp):
+        raise InvalidToken('token no longer valid')
+    try:
+        _add_revoked(claims)
+    except IntegrityError:
+        raise InvalidToken('token already used')
+
+    return issue(user)
+
+
+class RevocationList:
+    """Revoked refresh token ids, checked in memory
+
+    The ids of unexpired RevokedToken rows are loaded into a bloom filter
+    every REVOCATION_RELOAD seconds. A miss means the token isn't revoked,
+    a hit is confirmed in the database since it may be a false positive.
+    """
+
+    def __init__(self, reload=REVOCATION_RELOAD, error_rate=0.01):
+        self.reload = reload
+        self.error_rate = error_rate
+        self._bloom = None
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        jtis = list(RevokedToken.objects.filter(
+            expires__gt=datetime.now(timezone.utc)
+        ).values_list('jti', flat=True))
+        #room to grow until the next load
+        bloom = BloomFilter(max(1024, len(jtis) * 2), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+
+        return bloom
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._bloom is not None and now - self._loaded < self.reload:
+                return self._bloom
+        bloom = self._load()
+        with self._lock:
+            self._bloom, self._loaded = bloom, now
+
+        return bloom
+
+    def add(self, jti):
+        """Revoked in this process at once, the others on their reload"""
+        self._current().add(jti)
+
+    def clear(self):
+        """Load from the database on the next check"""
+        with self._lock:
+            self._bloom = None
+
+    def __contains__(self, jti):
+        if jti not in self._current():
+            return False
+
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+
+revoked = RevocationList()
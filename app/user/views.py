@@ -1,8 +1,18 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from user.serializer import UserSerializer, AuthTokenSerializer
+from user import tokens
+from user.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication, token_expired
+from user.serializer import UserSerializer, AuthTokenSerializer, \
+    RefreshTokenSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -15,13 +25,81 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Return the user's token, a new one if it expired, and a signed
+        access and refresh pair when SIGNED_TOKENS is on"""
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+        if not created and token_expired(token):
+            token.delete()
+            token = Token.objects.create(user=user)
+
+        data = {'token': token.key}
+        if tokens.SIGNED_TOKENS:
+            data.update(tokens.issue(user))
+
+        return Response(data)
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """mange access for user throug endpoint"""
     serializer_class = UserSerializer
     #sets authentication and permission for accessing endpoint
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication, SignedTokenAuthentication
+    )
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """returns the model from db for the logged in user """
-        return self.request.user    
\ No newline at end of file
+        if isinstance(self.request.auth, tokens.Claims):
+            #a signed token only carries the user's id
+            return generics.get_object_or_404(
+                get_user_model(), pk=self.request.user.pk
+            )
+        return self.request.user
+
+
+class SignedTokenView(APIView):
+    """Base for the views taking a signed refresh token"""
+    serializer_class = RefreshTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get_claims(self, request):
+        """The claims of the refresh token posted, 404 unless
+        SIGNED_TOKENS is on"""
+        if not tokens.SIGNED_TOKENS:
+            raise NotFound()
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return serializer.validated_data['refresh']
+
+
+class RefreshTokenView(SignedTokenView):
+    """Exchange a refresh token for a new access and refresh pair"""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            pair = tokens.refresh(self.get_claims(request))
+        except tokens.InvalidToken as error:
+            raise ValidationError(
+                {'refresh': [str(error)]}, code='authorization'
+            )
+
+        return Response(pair)
+
+
+class RevokeTokenView(SignedTokenView):
+    """Revoke a refresh token, ending the session on every process once
+    its access token expires"""
+
+    def post(self, request, *args, **kwargs):
+        tokens.revoke(self.get_claims(request))
+
+        return Response(status=status.HTTP_204_NO_CONTENT)